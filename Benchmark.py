@@ -0,0 +1,269 @@
+# End-to-end benchmark of the database and NARR code paths, entirely offline
+# Synthetic fixtures are generated in a scratch folder:
+#   - a Biomet database (float32 traces + clean_tv datenum trace, as in MicrometPy.ini) for MakeCSV
+#   - a datadump of daily TOA5 (.csv style) and CR10X (mixed subtable) logger files for MakeTraces
+#   - a small NARR style netCDF file on the Lambert conformal grid for PointSampleNARR
+# Each job is timed and the throughput (files/s, rows/s, MB/s, timesteps/s) is reported as JSON,
+# along with the stage level metrics from Instrumentation
+# Usage:
+#   python MicrometPy.py benchmark --sites 2 --years 2022 2023 --traces 50 --output benchmark.json
+
+import os
+import sys
+import json
+import time
+import shutil
+import tempfile
+import platform
+import contextlib
+import numpy as np
+import pandas as pd
+
+from Biomet_Database_Functions import ReadDatabase
+from Biomet_Database_Functions import Instrumentation
+
+# Location of the synthetic site (used to place the NARR grid)
+Site_Info = {'lat':49.129344,'lon':-122.984902,'utc_offset':-8}
+# NARR grid spacing (m) and time step (hours)
+NARR_dx = 32463.0
+NARR_dt = 3
+
+class Benchmark():
+    # Generate the fixtures, run each job (jobs = write, read, narr), and collect the results in self.Results
+    def __init__(self,Sites=1,Years=[2023],Traces=20,Days=30,Columns=16,Formats=['csv'],NARR_Days=365,NARR_Grid=24,
+                 Processes=None,Threads=None,jobs=['write','read','narr'],root=None,keep=False):
+        self.ini = ReadDatabase.readConfig([],ReadDatabase.MicrometPy)
+        # Parallelism defaults to the settings in WriteTraces.ini
+        Write_ini = ReadDatabase.readConfig('WriteTraces.ini',os.path.join(ReadDatabase.MicrometPy,'Biomet_Database_Functions'))
+        self.Sites = [f'BENCH{i+1}' for i in range(Sites)]
+        self.Years = Years
+        self.Traces = [f'TRACE_{i+1:03d}' for i in range(Traces)]
+        self.Days = Days
+        self.Columns = Columns
+        self.Formats = Formats
+        self.NARR_Days = NARR_Days
+        self.NARR_Grid = NARR_Grid
+        self.Processes = Processes if Processes is not None else Write_ini.getint('Multi_Processing','processes',fallback=1)
+        self.Threads = Threads if Threads is not None else Write_ini.getint('Multi_Processing','threads',fallback=1)
+        self.rng = np.random.default_rng(0)
+
+        if root is None:
+            self.root = tempfile.mkdtemp(prefix='MicrometPy_benchmark_')
+        else:
+            if os.path.isdir(root) and len(os.listdir(root)) > 0:
+                sys.exit(f'Benchmark folder {root} is not empty')
+            os.makedirs(root,exist_ok=True)
+            self.root = os.path.abspath(root)
+
+        self.Results = {
+            'time':time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'environment':{'python':platform.python_version(),'platform':platform.platform(),'cpu_count':os.cpu_count(),
+                           'numpy':np.__version__,'pandas':pd.__version__},
+            'parameters':{'sites':Sites,'years':Years,'traces':Traces,'days':Days,'columns':Columns,'formats':Formats,
+                          'narr_days':NARR_Days,'narr_grid':NARR_Grid,'processes':self.Processes,'threads':self.Threads},
+            'fixtures':{},
+        }
+        try:
+            if 'write' in jobs:
+                self.makeDatadump()
+                self.Results['write'] = self.timeWrite()
+            if 'read' in jobs:
+                self.makeDatabase()
+                self.Results['read'] = self.timeRead()
+            if 'narr' in jobs:
+                self.makeNARR()
+                self.Results['narr'] = self.timeNARR()
+        finally:
+            if keep == False:
+                shutil.rmtree(self.root,ignore_errors=True)
+            else:
+                self.Results['root'] = self.root
+
+    def makeDatabase(self):
+        # One stage per site and year with a clean_tv trace and len(self.Traces) float32 traces (~5% missing)
+        T1 = time.perf_counter()
+        self.Stage = 'Clean/SecondStage/'
+        size,files = 0,0
+        for Year in self.Years:
+            start = pd.Timestamp(f'{Year}-01-01 00:30').value
+            n_slots = (pd.Timestamp(f'{Year+1}-01-01 00:00').value-start)//(30*60*10**9)+1
+            ns = start+np.arange(n_slots,dtype=np.int64)*30*60*10**9
+            day = 24*60*60*10**9
+            clean_tv = ((ns//day+int(self.ini['Database']['datenum_base']))+(ns%day)/day).astype(self.ini['Database']['Timestamp_dtype'])
+            for Site in self.Sites:
+                path = os.path.join(self.root,'db','YEAR','SITE').replace('YEAR',str(Year)).replace('SITE',Site)+'/'+self.Stage
+                os.makedirs(path)
+                clean_tv.tofile(path+self.ini['Database']['Timestamp'])
+                for Trace_Name in self.Traces:
+                    Trace = self.rng.normal(10,5,n_slots).astype(self.ini['Database']['Trace_dtype'])
+                    Trace[self.rng.random(n_slots)<0.05] = np.nan
+                    Trace.tofile(path+Trace_Name)
+                size += clean_tv.nbytes+Trace.nbytes*len(self.Traces)
+                files += len(self.Traces)+1
+        self.Results['fixtures']['database'] = {'files':files,'MB':size/1e6,'seconds':time.perf_counter()-T1}
+
+        # Job config for MakeCSV, one request per output format
+        self.read_ini = os.path.join(self.root,'ReadTraces_benchmark.ini')
+        with open(self.read_ini,'w') as f:
+            f.write(f"[Paths]\ndatabase={self.root}/db/YEAR/SITE/\n\n")
+            f.write(f"[Output]\nRequests={','.join(f'Benchmark_{fmt}' for fmt in self.Formats)}\n\n")
+            for fmt in self.Formats:
+                f.write(f"[Benchmark_{fmt}]\nOutput_Paths={self.root}/read/SITE/\nby_Year=False\nStage={self.Stage}\n"
+                        f"Traces={','.join(self.Traces)}\nUnits={','.join('unit' for T in self.Traces)}\n"
+                        "Timestamp=TIMESTAMP\nTimestamp_FMT=%%Y-%%m-%%d %%H%%M\nTimestamp_Units=yyyy-mm-dd HHMM\n"
+                        f"Units_in_Header=False\nOutput_Format={fmt}\nRename=\n\n")
+
+    def makeDatadump(self):
+        # One TOA5 file and one CR10X file per site and day, starting on Jan 1 of the first year
+        T1 = time.perf_counter()
+        size,files,rows = 0,0,0
+        Columns = [f'Var_{i+1:02d}' for i in range(self.Columns)]
+        for Site in self.Sites:
+            path = os.path.join(self.root,'datadump',Site)
+            os.makedirs(path)
+            for day in pd.date_range(f'{self.Years[0]}-01-01',periods=self.Days,freq='D'):
+                Time = pd.date_range(day+pd.Timedelta('30min'),day+pd.Timedelta('1D'),freq='30min')
+                Values = self.rng.normal(10,5,(Time.shape[0],self.Columns))
+                fn = f'{path}/{Site}_TOA5_{day:%Y%m%d}.dat'
+                with open(fn,'w') as f:
+                    f.write(f'"TOA5","{Site}","CR1000","1234","CR1000.Std.32","CPU:Benchmark.CR1","1","Flux"\n')
+                    f.write(','.join(f'"{c}"' for c in ['TIMESTAMP','RECORD']+Columns)+'\n')
+                    f.write(','.join(f'"{c}"' for c in ['TS','RN']+['unit']*self.Columns)+'\n')
+                    f.write(','.join(f'"{c}"' for c in ['','']+['Avg']*self.Columns)+'\n')
+                    for i,t in enumerate(Time):
+                        f.write(f'"{t:%Y-%m-%d %H:%M:%S}",{i},'+','.join(f'{v:.4f}' for v in Values[i])+'\n')
+                size += os.path.getsize(fn)
+                # CR10X records are stamped YYYY,DOY,HHMM with midnight as 2400 of the previous day
+                # The daily battery record (subtable 122) is logged at 2400
+                fn = f'{path}/{Site}_CR10X_{day:%Y%m%d}.dat'
+                with open(fn,'w') as f:
+                    for i,t in enumerate(Time):
+                        stamp = t-pd.Timedelta('1min')
+                        hhmm = int(f'{t:%H%M}') if t.hour+t.minute > 0 else 2400
+                        f.write(f'121,{stamp.year},{stamp.dayofyear},{hhmm},'+','.join(f'{v:.3f}' for v in Values[i])+'\n')
+                    f.write(f'122,{stamp.year},{stamp.dayofyear},{hhmm},12.5,-6999\n')
+                size += os.path.getsize(fn)
+                files += 2
+                rows += Time.shape[0]*2+1
+        self.Results['fixtures']['datadump'] = {'files':files,'rows':rows,'MB':size/1e6,'seconds':time.perf_counter()-T1}
+
+        # Job config for MakeTraces, one section per site and logger format
+        Header_list = 'Subtable_id,Year,Day,Hour_Minute,'+','.join(Columns)
+        Header_units = '_,YYYY,DOY,HHMM,'+','.join(['unit']*self.Columns)
+        self.write_ini = os.path.join(self.root,'WriteTraces_benchmark.ini')
+        with open(self.write_ini,'w') as f:
+            f.write(f"[Paths]\ndatabase={self.root}/write_db/YEAR/SITE/\ndatadump={self.root}/datadump/SITE\n"
+                    f"manifest={self.root}/write_db/Manifests/SITE/\n\n")
+            f.write(f"[Input]\nFiles={','.join(f'{Site}_TOA5,{Site}_CR10X' for Site in self.Sites)}\n\n")
+            f.write(f"[Multi_Processing]\nProcesses={self.Processes}\nThreads={self.Threads}\n\n")
+            for Site in self.Sites:
+                f.write(f"[{Site}_TOA5]\nSite={Site}\npath_patterns={Site}_TOA5\nsubfolder=Flux\nTag=\nSubtable_id=\n"
+                        "Date_Cols=TIMESTAMP\nDate_Fmt=Auto\nHeader_Row=1\nHeader_list=\nHeader_units=\nFirst_Data_Row=4\nExclude=RECORD\n\n")
+                f.write(f"[{Site}_CR10X]\nSite={Site}\npath_patterns={Site}_CR10X\nsubfolder=Met\nTag=CR10X\nSubtable_id=121|122\n"
+                        "Date_Cols=Year,Day,Hour_Minute\nDate_Fmt=%%Y%%j%%H%%M\nHeader_Row=\n"
+                        f"Header_list={Header_list}|Subtable_id,Year,Day,Hour_Minute,BattV_MIN,_\n"
+                        f"Header_units={Header_units}|_,YYYY,DOY,HHMM,V,_\n"
+                        "First_Data_Row=0\nExclude=Subtable_id,Year,Day,Hour_Minute\n\n")
+
+    def makeNARR(self):
+        # hpbl on a NARR_Grid x NARR_Grid patch of the NARR Lambert conformal grid around the site, every 3 hours
+        # Same layout as the NOAA monolevel files: lon/lat (y,x), x (m), y (m), time (hours since 1800), hpbl (time,y,x)
+        import netCDF4 as nc
+        from pyproj import Transformer
+        from Extract_NARR_Data import Interpolation
+        T1 = time.perf_counter()
+        Year = self.Years[0]
+        path = os.path.join(self.root,'narr')+'/'
+        os.makedirs(path)
+        LCC = Transformer.from_crs('EPSG:4326',Interpolation.NARR_LCC,always_xy=True)
+        x0,y0 = LCC.transform(Site_Info['lon'],Site_Info['lat'])
+        # Offset by a third of a cell so the site doesn't sit on a grid line
+        x = (np.floor(x0/NARR_dx)+np.arange(self.NARR_Grid)-self.NARR_Grid//2)*NARR_dx+NARR_dx/3
+        y = (np.floor(y0/NARR_dx)+np.arange(self.NARR_Grid)-self.NARR_Grid//2)*NARR_dx+NARR_dx/3
+        xi,yi = np.meshgrid(x,y)
+        lon,lat = LCC.transform(xi,yi,direction='INVERSE')
+        hours = (pd.Timestamp(f'{Year}-01-01')-pd.Timestamp('1800-01-01'))/pd.Timedelta('1h')+np.arange(self.NARR_Days*24//NARR_dt)*NARR_dt
+        # Diurnal cycle (peak mid afternoon, local time) with a spatial gradient and noise
+        local = (hours+Site_Info['utc_offset'])%24
+        hpbl = (800+600*np.sin((local-9)/24*2*np.pi))[:,np.newaxis,np.newaxis]+(xi-x0)/1e3+(yi-y0)/2e3
+        hpbl = np.clip(hpbl+self.rng.normal(0,50,hpbl.shape),50,None).astype('float32')
+
+        self.nc_file = f'{path}hpbl_{Year}.nc'
+        with nc.Dataset(self.nc_file,'w') as ds:
+            ds.createDimension('time',None)
+            ds.createDimension('y',y.shape[0])
+            ds.createDimension('x',x.shape[0])
+            V = ds.createVariable('time','f8',('time',))
+            V.units = 'hours since 1800-01-01 00:00:0.0'
+            V[:] = hours
+            ds.createVariable('x','f4',('x',))[:] = x
+            ds.createVariable('y','f4',('y',))[:] = y
+            ds.createVariable('lon','f4',('y','x'))[:] = lon
+            ds.createVariable('lat','f4',('y','x'))[:] = lat
+            V = ds.createVariable('hpbl','f4',('time','y','x'))
+            V.units = 'm'
+            V[:] = hpbl
+        self.Results['fixtures']['narr'] = {'files':1,'timesteps':hours.shape[0],'MB':os.path.getsize(self.nc_file)/1e6,
+                                            'seconds':time.perf_counter()-T1}
+
+        # Overrides for PointSampleNARR, the file is already "downloaded" and the output is kept out of the database
+        self.narr_ini = os.path.join(self.root,'NARR_benchmark.ini')
+        with open(self.narr_ini,'w') as f:
+            f.write(f"[Site_Info]\nname={self.Sites[0]}\nlat={Site_Info['lat']}\nlon={Site_Info['lon']}\n"
+                    f"utc_offset={Site_Info['utc_offset']}\ntimestamp=TIMESTAMP\n\n")
+            f.write(f"[Downloads]\nnc_path={path}\nvar_name=hpbl\n\n")
+            f.write(f"[Outputs]\ndatadump={self.root}/narr_out/SITE\nfolder_name=NARR_Data\nformat=csv\nbiomet_database=False\n")
+
+    def run(self,job):
+        # Time a job (job is called with the tools' progress messages sent to stderr), returns the elapsed time and the stage metrics
+        # The heavier imports are done beforehand so they aren't counted
+        Instrumentation.Run.reset()
+        T1 = time.perf_counter()
+        with contextlib.redirect_stdout(sys.stderr):
+            job()
+        elapsed = time.perf_counter()-T1
+        Stages = {name:dict(S) for name,S in Instrumentation.Run.Stages.items()}
+        Instrumentation.Run.reset()
+        return(elapsed,Stages)
+
+    def timeWrite(self):
+        # Ingest the whole datadump into an empty database
+        from Biomet_Database_Functions import WriteDatabase
+        elapsed,Stages = self.run(lambda: WriteDatabase.MakeTraces(self.write_ini,incremental=True))
+        Fixture = self.Results['fixtures']['datadump']
+        Parse = Stages.get('parse',{'records':0,'bytes_read':0})
+        return({'seconds':elapsed,'files':Fixture['files'],'rows':Parse['records'],'MB_read':Parse['bytes_read']/1e6,
+                'MB_written':Stages.get('write',{'bytes_written':0})['bytes_written']/1e6,
+                'files_per_s':Fixture['files']/elapsed,'rows_per_s':Parse['records']/elapsed,
+                'MB_per_s':Parse['bytes_read']/1e6/elapsed,'stages':Stages})
+
+    def timeRead(self):
+        # Export every trace for every site and year, once per output format
+        elapsed,Stages = self.run(lambda: ReadDatabase.MakeCSV(self.Sites,self.Years,self.read_ini))
+        Read = Stages.get('read',{'bytes_read':0})
+        Export = Stages.get('export',{'records':0,'bytes_written':0})
+        return({'seconds':elapsed,'files':len(self.Sites)*len(self.Formats),'rows':Export['records'],
+                'MB_read':Read['bytes_read']/1e6,'MB_written':Export['bytes_written']/1e6,
+                'files_per_s':len(self.Sites)*len(self.Formats)/elapsed,'rows_per_s':Export['records']/elapsed,
+                'MB_per_s':Read['bytes_read']/1e6/elapsed,'stages':Stages})
+
+    def timeNARR(self):
+        # Sample the synthetic file at the site and resample to half hours
+        import scipy.interpolate, geopandas, folium
+        from Extract_NARR_Data import Interpolation
+        elapsed,Stages = self.run(lambda: Interpolation.PointSampleNARR(self.Sites[0],[self.Years[0]],ini=[self.narr_ini]))
+        Fixture = self.Results['fixtures']['narr']
+        return({'seconds':elapsed,'files':1,'timesteps':Fixture['timesteps'],'MB_read':Fixture['MB'],
+                'files_per_s':1/elapsed,'timesteps_per_s':Fixture['timesteps']/elapsed,'MB_per_s':Fixture['MB']/elapsed,
+                'stages':Stages})
+
+    def write(self,path=None):
+        # JSON to stdout, or to path (.jsonl files are appended to, one run per line)
+        if path is None:
+            print(json.dumps(self.Results,indent=2))
+        elif os.path.splitext(path)[1] == '.jsonl':
+            with open(path,'a') as out:
+                out.write(json.dumps(self.Results)+'\n')
+        else:
+            with open(path,'w') as out:
+                json.dump(self.Results,out,indent=2)
@@ -0,0 +1,142 @@
+# Stage level instrumentation shared by the MicrometPy tools
+# Wall time, CPU time, peak memory, bytes read/written, and record counts are accumulated for each named stage
+# and can be written as JSON lines (.jsonl, appended) or in the Prometheus text format (.prom, replaced)
+# Overhead is a couple of clock reads per stage, so it can be left on in production
+# Usage:
+#   with Instrumentation.stage('parse') as s:
+#       ...
+#       s.add(records=n,bytes_read=size)
+#   Instrumentation.write(path,job='write')
+
+import os
+import json
+import time
+import threading
+
+Metric_Names = {
+    'calls':'Number of times the stage was entered',
+    'wall_seconds':'Wall time spent in the stage',
+    'cpu_seconds':'CPU time (this process) spent in the stage',
+    'peak_memory_bytes':'Peak memory of the process at the end of the stage',
+    'bytes_read':'Bytes read by the stage',
+    'bytes_written':'Bytes written by the stage',
+    'records':'Records processed by the stage',
+}
+
+def peakMemory():
+    # High water mark of the process's resident memory (bytes), None if it can't be determined
+    try:
+        import resource
+        import sys
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # kB on Linux, bytes on macOS
+        return(peak if sys.platform == 'darwin' else peak*1024)
+    except ImportError:
+        pass
+    try:
+        import ctypes
+        from ctypes import wintypes
+        class Counters(ctypes.Structure):
+            _fields_ = [('cb',wintypes.DWORD),('PageFaultCount',wintypes.DWORD),
+                        ('PeakWorkingSetSize',ctypes.c_size_t),('WorkingSetSize',ctypes.c_size_t),
+                        ('QuotaPeakPagedPoolUsage',ctypes.c_size_t),('QuotaPagedPoolUsage',ctypes.c_size_t),
+                        ('QuotaPeakNonPagedPoolUsage',ctypes.c_size_t),('QuotaNonPagedPoolUsage',ctypes.c_size_t),
+                        ('PagefileUsage',ctypes.c_size_t),('PeakPagefileUsage',ctypes.c_size_t)]
+        counters = Counters()
+        counters.cb = ctypes.sizeof(Counters)
+        ctypes.windll.psapi.GetProcessMemoryInfo(ctypes.windll.kernel32.GetCurrentProcess(),ctypes.byref(counters),counters.cb)
+        return(counters.PeakWorkingSetSize)
+    except Exception:
+        return(None)
+
+class Stage():
+    # One pass through a named stage, counts can be added while it runs (from any thread)
+    def __init__(self,Metrics,name):
+        self.Metrics = Metrics
+        self.name = name
+        self.counts = {'records':0,'bytes_read':0,'bytes_written':0}
+
+    def add(self,records=0,bytes_read=0,bytes_written=0):
+        with self.Metrics.lock:
+            self.counts['records'] += records
+            self.counts['bytes_read'] += bytes_read
+            self.counts['bytes_written'] += bytes_written
+
+    def __enter__(self):
+        self.wall = time.perf_counter()
+        self.cpu = time.process_time()
+        return(self)
+
+    def __exit__(self,*exc):
+        wall = time.perf_counter()-self.wall
+        cpu = time.process_time()-self.cpu
+        self.Metrics.record(self.name,wall,cpu,**self.counts)
+        return(False)
+
+class Metrics():
+    # Totals by stage for one run
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.Stages = {}
+        self.started = time.time()
+
+    def stage(self,name):
+        return(Stage(self,name))
+
+    def record(self,name,wall,cpu,records=0,bytes_read=0,bytes_written=0):
+        peak = peakMemory()
+        with self.lock:
+            S = self.Stages.setdefault(name,{m:0 for m in Metric_Names})
+            S['calls'] += 1
+            S['wall_seconds'] += wall
+            S['cpu_seconds'] += cpu
+            S['records'] += records
+            S['bytes_read'] += bytes_read
+            S['bytes_written'] += bytes_written
+            if peak is not None:
+                S['peak_memory_bytes'] = max(S['peak_memory_bytes'],peak)
+
+    def write(self,path,**labels):
+        # Format is taken from the file extension: .prom for Prometheus, anything else is JSON lines
+        if path in ['','None'] or len(self.Stages) == 0:
+            return
+        if os.path.isdir(os.path.split(path)[0] or '.') == False:
+            os.makedirs(os.path.split(path)[0])
+        if os.path.splitext(path)[1] == '.prom':
+            self.writePrometheus(path,**labels)
+        else:
+            self.writeJSON(path,**labels)
+
+    def writeJSON(self,path,**labels):
+        # One line per stage, appended
+        timestamp = time.strftime('%Y-%m-%dT%H:%M:%S',time.localtime(self.started))
+        with open(path,'a') as out:
+            for name,S in self.Stages.items():
+                out.write(json.dumps({'time':timestamp,**labels,'stage':name,**S})+'\n')
+
+    def writePrometheus(self,path,**labels):
+        # Text exposition format (e.g. for the node_exporter textfile collector), swapped in place
+        lines = []
+        for metric,description in Metric_Names.items():
+            lines.append(f'# HELP micrometpy_stage_{metric} {description}')
+            lines.append(f'# TYPE micrometpy_stage_{metric} gauge')
+            for name,S in self.Stages.items():
+                tags = ','.join(f'{k}="{v}"' for k,v in {**labels,'stage':name}.items())
+                lines.append(f'micrometpy_stage_{metric}{{{tags}}} {S[metric]}')
+        with open(path+'.tmp','w') as out:
+            out.write('\n'.join(lines)+'\n')
+        os.replace(path+'.tmp',path)
+
+# Shared by every module in the process
+Run = Metrics()
+
+def stage(name):
+    return(Run.stage(name))
+
+def write(path,**labels):
+    # Write the stages recorded since the last write, then start over
+    Run.write(path,**labels)
+    Run.reset()
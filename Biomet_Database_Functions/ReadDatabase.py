@@ -1,34 +1,364 @@
 import os
+import re
 import sys
 import numpy as np
 import pandas as pd
 import configparser
 import argparse
 import datetime
+import time
+try:
+    from . import Instrumentation
+except ImportError:
+    import Instrumentation
 
-class MakeCSV():
+# Root of MicrometPy, shared configs are found from here rather than from the working directory
+MicrometPy = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
-    def __init__(self,Sites,Years,ini='ReadTraces.ini'):
+def modulePath(fn,base):
+    # Relative paths in a module's configs are relative to the module's folder (base)
+    if fn in ['','None'] or os.path.isabs(fn) or re.match(r'[A-Za-z]:[/\\]',fn):
+        return(fn)
+    return(os.path.join(base,fn))
+
+def readConfig(ini,base):
+    # MicrometPy.ini followed by the job ini(s) and any other configs
+    # ini files are taken from the working directory if they exist there, otherwise from the module's folder (base)
+    config = configparser.ConfigParser()
+    config.read(os.path.join(MicrometPy,'MicrometPy.ini'))
+    if type(ini) is str:
+        ini = [ini]
+    config.read([i if os.path.isfile(i) else modulePath(i,base) for i in ini])
+    return(config)
+
+def formatTimestamp(Time,fmt):
+    # Vectorized equivalent of DatetimeIndex.strftime for the directives used in the request sections
+    # Fields are derived with datetime64 arithmetic; anything else falls back to strftime
+    tokens = re.split(r'(%.)',fmt)
+    if any(t.startswith('%') and t[1:] not in 'YmdjHMS%' for t in tokens if len(t)==2):
+        return(Time.strftime(fmt))
+    values = np.asarray(Time.values,dtype='datetime64[s]')
+    Y = values.astype('datetime64[Y]')
+    M = values.astype('datetime64[M]')
+    D = values.astype('datetime64[D]')
+    m = values.astype('datetime64[m]')
+    fields = {
+        'Y':(Y.astype(np.int64)+1970,4),
+        'm':((M-Y).astype(np.int64)+1,2),
+        'd':((D-M).astype(np.int64)+1,2),
+        'j':((D-Y).astype(np.int64)+1,3),
+        'H':((m-D).astype(np.int64)//60,2),
+        'M':((m-D).astype(np.int64)%60,2),
+        'S':((values-m).astype(np.int64),2),
+    }
+    # Fill a fixed width byte buffer one field at a time, then view each row as a single string
+    width = sum(fields[t[1]][1] if len(t)==2 and t[1] in fields else len(t.replace('%%','%')) for t in tokens)
+    buffer = np.empty((values.shape[0],width),dtype=np.uint8)
+    col = 0
+    for t in tokens:
+        if len(t)==2 and t[0]=='%' and t[1] in fields:
+            v,w = fields[t[1]]
+            buffer[:,col:col+w] = (v[:,np.newaxis]//10**np.arange(w-1,-1,-1))%10+48
+            col += w
+        elif t != '':
+            literal = np.frombuffer(t.replace('%%','%').encode(),dtype=np.uint8)
+            buffer[:,col:col+literal.shape[0]] = literal
+            col += literal.shape[0]
+    return(buffer.view(f'S{width}').ravel().astype('U'))
+
+# File extensions for the supported output formats
+Output_Formats = {'csv':'.csv','parquet':'.parquet','feather':'.feather','npz':'.npz'}
+
+class Output():
+    # Incremental writer for exports; each call to write() appends one block of data
+    # Binary formats keep typed columns and a native datetime index, with units stored as column metadata
+    # pyarrow is only needed for parquet and feather outputs
+    def __init__(self,fn,fmt='csv',units=None):
+        self.fn = fn
+        self.fmt = fmt.lower()
+        self.units = units
+        self.writer = None
+        if self.fmt not in Output_Formats:
+            sys.exit(f'Unsupported output format {fmt}, expecting one of: {", ".join(Output_Formats)}')
+        if self.fmt == 'npz':
+            self.blocks = []
+
+    def write(self,Data):
+        if self.fmt == 'csv':
+            if self.writer is None:
+                self.writer = open(self.fn,'w',newline='')
+                Data.iloc[0:0].to_csv(self.writer)
+                if self.units is not None:
+                    pd.DataFrame(index=[self.units.get(Data.index.name,'')],columns=Data.columns,
+                                 data=[[self.units.get(c,'') for c in Data.columns]]).to_csv(self.writer,header=False)
+            Data.to_csv(self.writer,header=False)
+        elif self.fmt == 'npz':
+            # Blocks are concatenated once when the bundle is closed
+            self.blocks.append(Data)
+        else:
+            import pyarrow as pa
+            if self.writer is None:
+                schema = pa.Schema.from_pandas(Data)
+                units = self.units or {}
+                self.schema = pa.schema([f.with_metadata({'units':units[f.name]}) if f.name in units else f for f in schema],
+                                        metadata=schema.metadata)
+                if self.fmt == 'parquet':
+                    import pyarrow.parquet as pq
+                    self.writer = pq.ParquetWriter(self.fn,self.schema)
+                else:
+                    self.writer = pa.ipc.new_file(self.fn,self.schema,options=pa.ipc.IpcWriteOptions(compression='lz4'))
+            self.writer.write_table(pa.Table.from_pandas(Data,schema=self.schema))
+
+    def close(self):
+        if self.fmt == 'npz' and len(self.blocks)>0:
+            Data = self.blocks[0] if len(self.blocks)==1 else pd.concat(self.blocks)
+            bundle = {c:Data[c].values for c in Data.columns}
+            bundle[Data.index.name] = Data.index.values
+            units = self.units or {}
+            bundle['_units'] = np.array([[c,units.get(c,'')] for c in [Data.index.name]+list(Data.columns)])
+            with open(self.fn,'wb') as out:
+                np.savez_compressed(out,**bundle)
+            self.blocks = []
+        elif self.writer is not None:
+            self.writer.close()
+        self.writer = None
+
+def readOutput(fn,Timestamp=None):
+    # Load an export in any of the supported formats (by file extension) as a DataFrame with a DatetimeIndex
+    # For binary formats, units are returned in df.attrs['units']
+    ext = os.path.splitext(fn)[1].lower()
+    units = {}
+    if ext == '.npz':
+        with np.load(fn) as bundle:
+            columns = list(bundle['_units'][:,0])
+            units = {c:u for c,u in bundle['_units'] if u != ''}
+            df = pd.DataFrame(index=pd.DatetimeIndex(bundle[columns[0]],name=columns[0]),
+                              data={c:bundle[c] for c in columns[1:]})
+    elif ext in ['.parquet','.feather']:
+        if ext == '.parquet':
+            import pyarrow.parquet as pq
+            table = pq.read_table(fn)
+        else:
+            import pyarrow.feather as feather
+            table = feather.read_table(fn)
+        units = {f.name:f.metadata[b'units'].decode() for f in table.schema if f.metadata is not None and b'units' in f.metadata}
+        df = table.to_pandas()
+    else:
+        df = pd.read_csv(fn,parse_dates=[Timestamp],index_col=Timestamp)
+    df.attrs['units'] = units
+    return(df)
+
+# Layout of Summary.Data, one row per trace and day (Freq=D) or month (Freq=M)
+Summary_Columns = ['Trace','Freq','Period','count','min','max','mean','last']
+# Each trace has a fixed size sidecar (float64, one row per day of the year) in the stage's Summary folder
+# last is the slot (half-hour of the year, 0 = Jan 1 00:30) of the last valid value, NaN if the day has no data
+Summary_Stats = ['count','min','max','mean','last']
+
+def dailySummary(Trace,days):
+    # Daily count, min, max, mean and last valid slot for a year of half-hourly values, as a (days x Summary_Stats) array
+    # Day 0 holds Jan 1 00:30 to Jan 2 00:00; if Trace is a memory map only the requested days are read
+    block = np.asarray(np.asarray(Trace).reshape(-1,48)[days],dtype='float64')
+    valid = np.isfinite(block)
+    count = valid.sum(axis=1)
+    masked = np.where(valid,block,np.nan)
+    with np.errstate(all='ignore'):
+        Min = np.where(count>0,np.fmin.reduce(masked,axis=1),np.nan)
+        Max = np.where(count>0,np.fmax.reduce(masked,axis=1),np.nan)
+        Mean = np.where(count>0,np.where(valid,block,0).sum(axis=1)/count,np.nan)
+    last = np.where(count>0,np.asarray(days)*48+47-np.argmax(valid[:,::-1],axis=1),np.nan)
+    return(np.column_stack([count,Min,Max,Mean,last]))
+
+def updateSummary(fn,Daily,days,n_days):
+    # Rows for the touched days are updated in place (through a memory map), like the traces, so the cost is proportional to the new data
+    # A missing (or wrong size) sidecar, or one where every day is replaced, is written to a temporary file and swapped in place
+    if Daily.shape[0] == 0:
+        return
+    shape = (n_days,len(Summary_Stats))
+    if len(days) < n_days and os.path.isfile(fn) and os.path.getsize(fn) == shape[0]*shape[1]*8:
+        Sidecar = np.memmap(fn,dtype='float64',mode='r+',shape=shape)
+        Sidecar[days] = Daily
+        Sidecar.flush()
+        del Sidecar
+    else:
+        Sidecar = np.full(shape,np.nan)
+        Sidecar[:,0] = 0
+        Sidecar[days] = Daily
+        if os.path.isdir(os.path.split(fn)[0]) == False:
+            os.makedirs(os.path.split(fn)[0],exist_ok=True)
+        with open(fn+'.tmp','wb') as out:
+            Sidecar.tofile(out)
+        os.replace(fn+'.tmp',fn)
+
+def readSummary(fn,Trace_Name,Year):
+    # Daily rows (Summary_Columns) from one trace's sidecar
+    Sidecar = np.fromfile(fn,dtype='float64').reshape(-1,len(Summary_Stats))
+    Daily = pd.DataFrame(Sidecar,columns=Summary_Stats)
+    Daily['count'] = Daily['count'].astype('int64')
+    Daily['last'] = pd.Timestamp(f'{Year}-01-01 00:30')+pd.to_timedelta(Daily['last']*30,unit='min')
+    Daily.insert(0,'Period',pd.Timestamp(f'{Year}-01-01')+pd.to_timedelta(np.arange(Sidecar.shape[0]),unit='D'))
+    Daily.insert(0,'Freq','D')
+    Daily.insert(0,'Trace',Trace_Name)
+    return(Daily)
+
+class Database():
+    # Shared methods for reading traces from the Biomet database
+    def __init__(self,ini):
         # Create a config file based on the job (Write vs. Read; standard vs. custom)
-        self.ini = configparser.ConfigParser()
-        self.ini.read('../MicrometPy.ini')
-        self.ini.read(ini)
+        self.ini = readConfig(ini,os.path.dirname(os.path.abspath(__file__)))
+
+    def getTime(self):
+        Timestamp = self.ini['Database']['Timestamp']
+        Timestamp_alt = self.ini['Database']['Timestamp']
+        filename = self.sub(self.ini['Paths']['database'])+self.Stage+Timestamp
+        filename_alt = self.sub(self.ini['Paths']['database'])+self.Stage+Timestamp_alt
+        if os.path.isfile(filename)+os.path.isfile(filename_alt) == 0:
+            self.skip_Flag = True
+
+        else:
+            with Instrumentation.stage('read') as stage:
+                try:
+                    with open(filename, mode='rb') as file:
+                        Time_Trace = np.fromfile(file, self.ini['Database']['Timestamp_dtype'])
+                except:
+                    with open(filename_alt, mode='rb') as file:
+                        Time_Trace = np.fromfile(file, self.ini['Database']['Timestamp_dtype'])
+                    pass
+                stage.add(bytes_read=Time_Trace.nbytes)
+            if self.ini['Database']['Timestamp_fmt'] == 'datenum':
+                base = float(self.ini['Database']['datenum_base'])
+                unit = self.ini['Database']['datenum_base_unit']
+                self.Time_Trace_Num = Time_Trace+0
+                self.Time_Trace = pd.to_datetime(Time_Trace-base,unit=unit).round('T')
+            else:
+                # Datenum is depreciated and we should consider upgrading
+                warning = 'Revise code for new timestamp format'
+                sys.exit(warning)
+            self.skip_Flag=False
+
+    def readTrace(self):
+        D_traces = {}
+        with Instrumentation.stage('read') as stage:
+            for Trace_Name in self.traces:
+                filename = self.sub(self.ini['Paths']['database'])+self.Stage+Trace_Name
+                try:
+                    with open(filename, mode='rb') as file:
+                        trace = np.fromfile(file, self.ini['Database']['Trace_dtype'])
+                    stage.add(bytes_read=trace.nbytes)
+                except:
+                    print(f'Trace does not exist {filename} , proceeding without')
+                    trace = np.full(self.Time_Trace.shape[0],np.nan,dtype=self.ini['Database']['Trace_dtype'])
+                    pass
+                D_traces[Trace_Name]=trace
+            stage.add(records=self.Time_Trace.shape[0])
+        return (D_traces)
+
+    def sub(self,val):
+        v = val.replace('YEAR',str(self.Year)).replace('SITE',self.Site)
+        return(v)
+
+
+class LoadTraces(Database):
+    # Read a set of traces for one site straight from the database into memory, without an intermediate file
+    # self.Data holds the traces (as Trace_dtype) for all available years, with a DatetimeIndex named Timestamp
+    def __init__(self,Site,Years,Stage,Traces,Timestamp='TIMESTAMP',ini=[]):
+        super().__init__(ini)
+        self.Site = Site
+        self.Stage = Stage
+        self.traces = Traces
+        Data = []
+        for Year in Years:
+            self.Year = Year
+            if os.path.exists(self.sub(self.ini['Paths']['database'])+self.Stage):
+                self.getTime()
+                if self.skip_Flag == False:
+                    Data.append(pd.DataFrame(index=pd.DatetimeIndex(self.Time_Trace,name=Timestamp),data=self.readTrace()))
+        if len(Data)>0:
+            self.Data = pd.concat(Data)
+        else:
+            self.Data = pd.DataFrame(index=pd.DatetimeIndex([],name=Timestamp),columns=Traces,dtype=self.ini['Database']['Trace_dtype'])
+
+
+class Summary(Database):
+    # Coverage and summary statistics from the sidecars kept by WriteDatabase, without opening any trace files
+    # self.Data has one row per trace and period (Freq = 'D' for days or 'M' for months) across all years with sidecars
+    def __init__(self,Site,Years,Stage,Traces=None,Freq='M',ini=[]):
+        super().__init__(ini)
+        self.Site = Site
+        self.Stage = Stage
+        self.Years = Years
+        self.Freq = Freq
+        Data = []
+        for Year in Years:
+            self.Year = Year
+            path = os.path.join(self.sub(self.ini['Paths']['database'])+self.Stage,self.ini['Database']['Summary'])
+            if os.path.isdir(path) == False:
+                continue
+            for Trace_Name in (Traces if Traces is not None else sorted(os.listdir(path))):
+                fn = os.path.join(path,Trace_Name)
+                if os.path.isfile(fn) and fn.endswith('.tmp') == False:
+                    Data.append(readSummary(fn,Trace_Name,Year))
+        Daily = pd.concat(Data,ignore_index=True) if len(Data)>0 else pd.DataFrame(columns=Summary_Columns)
+        if Freq == 'M':
+            # Months are aggregated from the daily rows
+            Daily['sum'] = Daily['mean'].fillna(0)*Daily['count']
+            Daily['Period'] = pd.to_datetime(Daily['Period']).dt.to_period('M').dt.to_timestamp()
+            Monthly = Daily.groupby(['Trace','Period']).agg(count=('count','sum'),min=('min','min'),max=('max','max'),
+                                                            sum=('sum','sum'),last=('last','max')).reset_index()
+            Monthly['mean'] = Monthly['sum']/Monthly['count'].where(Monthly['count']>0)
+            Daily = Monthly.assign(Freq='M')
+        self.Data = Daily[Summary_Columns].assign(Period=pd.to_datetime(Daily['Period']),last=pd.to_datetime(Daily['last']))
+
+    def coverage(self):
+        # Fraction of the half hours in each period with valid data (Period x Trace)
+        if self.Freq == 'M':
+            expected = self.Data['Period'].dt.days_in_month*48
+        else:
+            expected = 48
+        Coverage = self.Data.assign(coverage=self.Data['count']/expected)
+        return(Coverage.pivot(index='Period',columns='Trace',values='coverage'))
+
+    def stat(self,stat='mean'):
+        # Any of the summary columns (count, min, max, mean, last) as a Period x Trace table
+        return(self.Data.pivot(index='Period',columns='Trace',values=stat))
+
+    def rebuild(self):
+        # Create (or replace) the sidecars by reading every trace in the stage once, e.g. for stages written by other tools
+        for Year in self.Years:
+            self.Year = Year
+            path = self.sub(self.ini['Paths']['database'])+self.Stage
+            if os.path.isdir(path) == False:
+                continue
+            n_slots = (pd.Timestamp(f'{Year+1}-01-01 00:00')-pd.Timestamp(f'{Year}-01-01 00:30'))//pd.Timedelta('30min')+1
+            days = np.arange(n_slots//48)
+            for entry in os.scandir(path):
+                if entry.is_file() and entry.stat().st_size == n_slots*np.dtype(self.ini['Database']['Trace_dtype']).itemsize:
+                    if entry.name not in [self.ini['Database']['Timestamp'],self.ini['Database']['Timestamp_Alt']]:
+                        Trace = np.fromfile(entry.path,self.ini['Database']['Trace_dtype'])
+                        updateSummary(os.path.join(path,self.ini['Database']['Summary'],entry.name),dailySummary(Trace,days),days,days.shape[0])
+
+
+class MakeCSV(Database):
+
+    def __init__(self,Sites,Years,ini='ReadTraces.ini'):
+        super().__init__(ini)
 
         for Site in Sites:
             self.Site = Site
             for Request in self.ini['Output']['Requests'].split(','):
-                print(f'Creating .csv files for {Site}: {Request}')
+                print(f"Creating .{self.ini[Request].get('Output_Format','csv')} files for {Site}: {Request}")
                 self.Request = Request
-                if self.ini[self.Request]['by_Year']=='False':
-                    self.AllData = pd.DataFrame()
+                self.Stage = self.ini[self.Request]['Stage']
+                # Each year is streamed to the output as it is read, so only one year of traces is held in memory
+                self.out = None
+                self.rows = 0
+                T1 = time.time()
                 for Year in Years:
                     self.Year = Year
-                    if os.path.exists(self.sub(self.ini['Paths']['database'])+self.ini[self.Request]['Stage']):
+                    if os.path.exists(self.sub(self.ini['Paths']['database'])+self.Stage):
                         self.readDB()
                     else:
                         pass
-                if self.ini[self.Request]['by_Year']=='False':
-                    self.write()
+                self.close(time.time()-T1)
                     
     def readDB(self):
         self.getTime()
@@ -36,91 +366,59 @@ class MakeCSV():
             # for self.Request in self.ini['Output']['self.Requests'].split(','):
             self.traces = self.ini[self.Request]['Traces'].split(',')
             D_traces = self.readTrace()
-            self.Data = pd.DataFrame(index=self.Time_Trace,data=D_traces)
-            self.Data[self.ini[self.Request]['Timestamp']] = self.Data.index.floor('Min').strftime(self.ini[self.Request]['Timestamp_FMT'])
-            self.traces.insert(0,self.ini[self.Request]['Timestamp'])
+            self.fmt = self.ini[self.Request].get('Output_Format','csv').lower()
+            if self.fmt == 'csv':
+                Timestamp = formatTimestamp(self.Time_Trace.floor('Min'),self.ini[self.Request]['Timestamp_FMT'])
+            else:
+                # Binary formats keep the native datetime index
+                Timestamp = self.Time_Trace.floor('Min')
+            self.Data = pd.DataFrame(index=pd.Index(Timestamp,name=self.ini[self.Request]['Timestamp']),data=D_traces)
             rn = {}
             for renames in self.ini[self.Request]['Rename'].split(' '):
                 r = renames.split('|')
                 if len(r)>1:
                     rn[r[0]]=r[1]
             self.Data = self.Data.rename(columns=rn)
-            if self.ini[self.Request]['by_Year']=='True':
-                self.AllData = self.Data
-                self.write()
-            else:
-                self.AllData = pd.concat([self.AllData,self.Data])
-
-    def getTime(self):
-        Timestamp = self.ini['Database']['Timestamp']
-        Timestamp_alt = self.ini['Database']['Timestamp']
-        filename = self.sub(self.ini['Paths']['database'])+self.ini[self.Request]['Stage']+Timestamp
-        filename_alt = self.sub(self.ini['Paths']['database'])+self.ini[self.Request]['Stage']+Timestamp_alt
-        if os.path.isfile(filename)+os.path.isfile(filename_alt) == 0:
-            self.skip_Flag = True
-
-        else:
-            try:
-                with open(filename, mode='rb') as file:
-                    Time_Trace = np.fromfile(file, self.ini['Database']['Timestamp_dtype'])
-            except:
-                with open(filename_alt, mode='rb') as file:
-                    Time_Trace = np.fromfile(file, self.ini['Database']['Timestamp_dtype'])
-                pass
-            if self.ini['Database']['Timestamp_fmt'] == 'datenum':
-                base = float(self.ini['Database']['datenum_base'])
-                unit = self.ini['Database']['datenum_base_unit']
-                self.Time_Trace_Num = Time_Trace+0
-                self.Time_Trace = pd.to_datetime(Time_Trace-base,unit=unit).round('T')
-            else:
-                # Datenum is depreciated and we should consider upgrading
-                warning = 'Revise code for new timestamp format'
-                sys.exit(warning)
-            self.skip_Flag=False
-
-    def readTrace(self):
-        D_traces = {}
-        for Trace_Name in self.traces:
-            filename = self.sub(self.ini['Paths']['database'])+self.ini[self.Request]['Stage']+Trace_Name
-            try:
-                with open(filename, mode='rb') as file:
-                    trace = np.fromfile(file, self.ini['Database']['Trace_dtype'])
-            except:
-                print(f'Trace does not exist {filename} , proceeding without')
-                trace = np.empty(self.Time_Trace.shape[0])
-                trace[:] = np.nan
-                pass
-            D_traces[Trace_Name]=trace
-        return (D_traces)
+            self.write()
 
     def write(self):
-        if self.AllData.empty:
-            print(f'No data to write for{self.Site}: {self.Year}')
-        else:
+        # The output is opened once (per year if by_Year), then each block is appended
+        if self.out is None or self.ini[self.Request]['by_Year']=='True':
+            self.close()
             output_path = self.sub(self.ini[self.Request]['Output_Paths'])
             if os.path.exists(output_path)==False:
                 os.makedirs(output_path)
-            output_path = output_path+self.Request+'.csv'
-            self.addUnits()
-            self.AllData.set_index(self.ini[self.Request]['Timestamp'],inplace=True)
-            self.AllData.to_csv(output_path)
+            self.output_path = output_path+self.Request+Output_Formats[self.fmt]
+            self.out = Output(self.output_path,self.fmt,self.getUnits())
+        with Instrumentation.stage('export') as stage:
+            self.out.write(self.Data)
+            stage.add(records=self.Data.shape[0])
+        self.rows += self.Data.shape[0]
+
+    def close(self,elapsed=None):
+        if self.out is not None:
+            with Instrumentation.stage('export') as stage:
+                self.out.close()
+                stage.add(bytes_written=os.path.getsize(self.output_path))
+            self.out = None
+        if elapsed is not None:
+            if self.rows == 0:
+                print(f'No data to write for {self.Site}: {self.Request}')
+            else:
+                print(f'Wrote {self.rows} rows for {self.Site}: {self.Request} ({self.rows/max(elapsed,1e-9):.0f} rows/s)')
         
-    def addUnits(self):
-        if self.ini[self.Request]['Units_in_Header'].lower() == 'true':
-            units = self.ini[self.Request]['Units'].split(',')
-            units.insert(0,self.ini[self.Request]['Timestamp_Units'])
-            unit_dic = {t:u for t,u in zip(self.traces,units)}
-            self.AllData = pd.concat([pd.DataFrame(index=[-1],data=unit_dic),self.AllData])
+    def getUnits(self):
+        # Units are matched to the (renamed) columns by position
+        # csv files only get a units row if requested, binary formats always store them as metadata
+        if self.fmt != 'csv' or self.ini[self.Request]['Units_in_Header'].lower() == 'true':
+            units = {c:u for c,u in zip(self.Data.columns,self.ini[self.Request]['Units'].split(','))}
+            if self.fmt == 'csv':
+                units[self.Data.index.name] = self.ini[self.Request]['Timestamp_Units']
+            return(units)
             
-    def sub(self,val):
-        v = val.replace('YEAR',str(self.Year)).replace('SITE',self.Site)
-        return(v)
 
         
 if __name__ == '__main__':
-    
-    file_path = os.path.split(__file__)[0]
-    os.chdir(file_path)
 
     # If called from command line ...
     CLI=argparse.ArgumentParser()
@@ -1,17 +1,28 @@
+import io
 import os
+import re
+import time
+import hashlib
 import numpy as np
 import pandas as pd
-import configparser
 import argparse
-import datetime
+from functools import partial
+from multiprocessing import Pool
+from multiprocessing.pool import ThreadPool
+try:
+    from . import ReadDatabase
+    from . import Instrumentation
+except ImportError:
+    import ReadDatabase
+    import Instrumentation
 
 class Write():
     def __init__(self,ini):#,ini='WriteTraces.ini'):
                
         # Create a config file based on the job (Write vs. Read; standard vs. custom)
-        self.ini = configparser.ConfigParser()
-        self.ini.read('../MicrometPy.ini')
-        self.ini.read(ini)
+        self.ini = ReadDatabase.readConfig(ini,os.path.dirname(os.path.abspath(__file__)))
+        # When True, existing traces are merged with (rather than replaced by) the new data
+        self.incremental = False
     
     def dateIndex(self):
         Date_cols = [i for i in self.ini[self.Site_File]['Date_Cols'].split(',')]
@@ -21,31 +32,67 @@ class Write():
             self.Data = self.Data.set_index(Date_col)
 
         else:
-            self.Data['Timestamp'] = ''
-            for col in self.ini[self.Site_File]['Date_Cols'].split(','):
-                ix = self.ini[self.Site_File]['Header_list'].split(',').index(col)
-                unit = self.ini[self.Site_File]['Header_units'].split(',')[ix]
-                if unit.upper() == 'HHMM':
-                    self.Data.loc[self.Data[col]==2400,col]=0
-                self.Data['Timestamp'] = self.Data['Timestamp'].str.cat(self.Data[col].astype(str).str.zfill(len(unit)),sep='')
-            self.Data['Timestamp'] = pd.to_datetime(self.Data['Timestamp'],format=self.ini[self.Site_File]['Date_Fmt'])
+            self.Data['Timestamp'] = self.numericTimestamp(Date_cols)
+            valid = self.Data['Timestamp'].notna()
+            if valid.all() == False:
+                print(f'Dropping {(~valid).sum()} records with incomplete dates')
+                self.Data = self.Data.loc[valid]
             self.Data = self.Data.set_index('Timestamp')
-        self.Data=self.Data.resample('30T').first()
+        # Snap onto the half-hourly grid (same bins as resample('30T')) and collapse duplicate timestamps
+        self.Data.index = self.Data.index.floor('30T')
+        if self.Data.index.is_unique == False:
+            self.Data = self.Data.groupby(level=0).first()
+        elif self.Data.index.is_monotonic_increasing == False:
+            self.Data = self.Data.sort_index()
+
+    def numericTimestamp(self,Date_cols):
+        # Build datetime64 values from integer date columns (e.g. YYYY,DOY,HHMM or YYYY,MM,DD,HH,MM) with array arithmetic
+        # Each column takes as many Date_Fmt directives as fit in the width of its unit label (e.g., HHMM -> %H%M)
+        # HHMM = 2400 is treated as 24:00, which rolls over to midnight of the following day
+        Widths = {'Y':4,'y':2,'m':2,'d':2,'j':3,'H':2,'M':2,'S':2}
+        directives = re.findall(r'%(.)',self.ini[self.Site_File]['Date_Fmt'])
+        Header_list = self.ini[self.Site_File]['Header_list'].split(',')
+        Header_units = self.ini[self.Site_File]['Header_units'].split(',')
+        fields = {}
+        for col in Date_cols:
+            unit = Header_units[Header_list.index(col)]
+            values = self.Data[col].to_numpy(dtype='float64')
+            width = len(unit)
+            while width > 0 and len(directives) > 0:
+                d = directives.pop(0)
+                width -= Widths[d]
+                fields[d] = (values//10**width)%10**Widths[d]
+        valid = np.all([np.isfinite(v) for v in fields.values()],axis=0)
+        fields = {d:np.where(valid,v,0).astype(np.int64) for d,v in fields.items()}
+        if 'Y' in fields:
+            year = fields['Y']
+        else:
+            year = np.where(fields['y']<69,2000,1900)+fields['y']
+        days = (year-1970).astype('datetime64[Y]')
+        if 'j' in fields:
+            days = days.astype('datetime64[D]')+(fields['j']-1)
+        else:
+            months = days.astype('datetime64[M]')+(fields.get('m',1)-1)
+            days = months.astype('datetime64[D]')+(fields.get('d',1)-1)
+        seconds = fields.get('H',0)*3600+fields.get('M',0)*60+fields.get('S',0)
+        Timestamp = days.astype('datetime64[s]')+seconds
+        return(np.where(valid,Timestamp.astype('datetime64[ns]'),np.datetime64('NaT')))
 
     def FullYear(self):
-        for self.y in self.Data.index.year.unique():
-            self.Year = pd.DataFrame(data={'Timestamp':pd.date_range(start = f'{self.y}01010030',end=f'{self.y+1}01010001',freq='30T')})
-            self.Year = self.Year.set_index('Timestamp')
-            self.Year = self.Year.join(self.Data)
-            
-            d_1970 = datetime.datetime(1970,1,1,0,0)
-            self.Year['Floor'] = self.Year.index.floor('D')
-            self.Year['Secs'] = ((self.Year.index-self.Year['Floor']).dt.seconds/ (24.0 * 60.0 * 60.0))
-            self.Year['Days'] = ((self.Year.index-d_1970).days+int(self.ini['Database']['datenum_base']))
-
-            self.Year[self.ini['Database']['Timestamp']] = self.Year['Secs']+self.Year['Days']
-            self.Year = self.Year.drop(columns=['Floor','Secs','Days'])
-            self.Write()
+        # Each record is written to its slot on the year's fixed half-hourly grid (Jan 1 00:30 to Jan 1 00:00 of the following year)
+        # Midnight on Jan 1 is the last record of the previous year
+        step = 30*60*10**9
+        ns = self.Data.index.asi8
+        Years = (self.Data.index-pd.Timedelta('30T')).year
+        with Instrumentation.stage('write') as self.write_stage:
+            for self.y in Years.unique():
+                rows = np.asarray(Years==self.y)
+                start = pd.Timestamp(f'{self.y}-01-01 00:30').value
+                self.n_slots = (pd.Timestamp(f'{self.y+1}-01-01 00:00').value-start)//step+1
+                self.slots = (ns[rows]-start)//step
+                self.Year = self.Data.loc[rows]
+                self.Write()
+            self.write_stage.add(records=self.Data.shape[0])
     
     def Write(self):
         self.write_dir = self.ini['Paths']['database'].replace('YEAR',str(self.y)).replace('SITE',self.site_name)+self.ini[self.Site_File]['subfolder']
@@ -54,91 +101,316 @@ class Write():
             print('Creating new directory at:\n', self.write_dir)
             os.makedirs(self.write_dir)
 
-        for T in self.Year.columns:
-            if T == self.ini['Database']['Timestamp']:
-                fmt = self.ini['Database']['Timestamp_dtype']
+        self.summary_dir = f"{self.write_dir}/{self.ini['Database']['Summary']}"
+        os.makedirs(self.summary_dir,exist_ok=True)
+
+        self.writeTimestamp()
+        # Traces (and their summary sidecars) are independent files, so they can be written in parallel
+        threads = self.ini.getint('Multi_Processing','threads',fallback=1)
+        if threads > 1 and self.Year.shape[1] > 1:
+            with ThreadPool(processes=threads) as pool:
+                pool.map(self.writeTrace,self.Year.columns)
+        else:
+            for T in self.Year.columns:
+                self.writeTrace(T)
+
+    def writeTimestamp(self):
+        # The timestamp trace only needs to be written when it is missing (or the wrong length)
+        fn = f"{self.write_dir}/{self.ini['Database']['Timestamp']}"
+        fmt = self.ini['Database']['Timestamp_dtype']
+        if os.path.isfile(fn) and os.path.getsize(fn) == self.n_slots*np.dtype(fmt).itemsize:
+            return
+        # datenum = whole days since 0000-01-00 + fraction of the day, straight from the int64 grid
+        ns = pd.Timestamp(f'{self.y}-01-01 00:30').value+np.arange(self.n_slots,dtype=np.int64)*30*60*10**9
+        day = 24*60*60*10**9
+        Trace = ((ns//day+int(self.ini['Database']['datenum_base']))+(ns%day)/day).astype(fmt)
+        self.replaceFile(fn,Trace)
+
+    def writeTrace(self,T):
+        # Existing traces are updated in place (through a memory map) so only the slots with new data are touched
+        # In incremental mode values already in the database are kept wherever the new data are missing
+        # Otherwise (or if the trace doesn't exist yet) the trace is rebuilt in a temporary file and swapped in
+        # The daily statistics for the days that were touched are then updated in the trace's summary sidecar
+        fmt = self.ini['Database']['Trace_dtype']
+        values = self.Year[T].to_numpy(dtype=fmt)
+        slots = self.slots
+        if self.ini[self.Site_File]['Tag']!='':
+            T += '_' + self.ini[self.Site_File]['Tag']
+        fn = f'{self.write_dir}/{T}'
+        exists = os.path.isfile(fn)
+        if self.incremental == True:
+            keep = ~np.isnan(values)
+            values,slots = values[keep],slots[keep]
+        sidecar = f'{self.summary_dir}/{T}'
+        if self.incremental == True and exists and os.path.getsize(fn) == self.n_slots*np.dtype(fmt).itemsize:
+            if os.path.isfile(sidecar):
+                days = np.unique(slots//48)
             else:
-                fmt = self.ini['Database']['Trace_dtype']
-            Trace = self.Year[T].astype(fmt).values
-            if self.ini[self.Site_File]['Tag']!='' and T != self.ini['Database']['Timestamp']:
-                T += '_' + self.ini[self.Site_File]['Tag']
-            with open(f'{self.write_dir}/{T}','wb') as out:
-                Trace.tofile(out)
+                # Trace written before sidecars were kept, summarize the whole year once
+                days = np.arange(self.n_slots//48)
+            Trace = np.memmap(fn,dtype=fmt,mode='r+',shape=(self.n_slots,))
+            if values.shape[0] > 0:
+                Trace[slots] = values
+                Trace.flush()
+                self.write_stage.add(bytes_written=values.nbytes)
+        else:
+            days = np.arange(self.n_slots//48)
+            Trace = np.full(self.n_slots,np.nan,dtype=fmt)
+            if self.incremental == True and exists:
+                # Trace is the wrong length, keep what fits
+                Old = np.fromfile(fn,dtype=fmt)[:self.n_slots]
+                Trace[:Old.shape[0]] = Old
+            Trace[slots] = values
+            self.replaceFile(fn,Trace)
+        Daily = ReadDatabase.dailySummary(Trace,days)
+        del Trace
+        ReadDatabase.updateSummary(sidecar,Daily,days,self.n_slots//48)
+        self.write_stage.add(bytes_written=Daily.nbytes)
+
+    def replaceFile(self,fn,Trace):
+        # Write to a temporary file, then swap it in place so readers never see a partially written trace
+        with open(fn+'.tmp','wb') as out:
+            Trace.tofile(out)
+        os.replace(fn+'.tmp',fn)
+        self.write_stage.add(bytes_written=Trace.nbytes)
 
 
 class MakeTraces(Write):
-    def __init__(self,ini='WriteTraces.ini'):
+    def __init__(self,ini='WriteTraces.ini',incremental=True):
         super().__init__(ini)
-        for self.Site_File in self.ini['Input']['Files'].split(','):
-            self.site_name = self.ini[self.Site_File]['Site']
-            self.findFiles()
-
-    def findFiles(self):
-        patterns = self.ini[self.Site_File]['path_patterns'].split(',')
-        self.Data = pd.DataFrame()
-        self.Metadata = pd.DataFrame()
-        for dir,_,files in os.walk(self.ini['Paths']['datadump'].replace('SITE',self.site_name)):
-            for file in (files):
-                fn = f"{dir}/{file}"
-                if len([p for p in patterns if p not in fn])==0:
-                    if self.ini[self.Site_File]['Subtable_id'] == '':
-                        self.readSingle(fn)
-                    else:
-                        self.readSubTables(fn)
-        self.dateIndex()
+        self.incremental = incremental
+        # Timestamps of the records written by this run, by site (e.g., so watch mode can process only the new half-hours)
+        self.Updated = {}
+        # Each section is only processed once, even if it is listed more than once
+        # Sections are grouped by site so each site's datadump is only scanned once
+        Sites = {}
+        for Site_File in dict.fromkeys(self.ini['Input']['Files'].split(',')):
+            Sites.setdefault(self.ini[Site_File]['Site'],[]).append(Site_File)
+        for self.site_name,Site_Files in Sites.items():
+            with Instrumentation.stage('discover') as stage:
+                Routed = self.scanDatadump(Site_Files)
+                stage.add(records=sum(len(files) for files in Routed.values()))
+            for self.Site_File in Site_Files:
+                self.findFiles(Routed[self.Site_File])
+
+    def scanDatadump(self,Site_Files):
+        # Walk the site's datadump once and route each file to every section whose path_patterns all match
+        # A file must contain at least one pattern (any section) before the per-section matchers are checked
+        matchers = {}
+        for Site_File in Site_Files:
+            patterns = self.ini[Site_File]['path_patterns'].split(',')
+            matchers[Site_File] = re.compile(''.join(f'(?=.*{re.escape(p)})' for p in patterns),re.DOTALL)
+        any_pattern = re.compile('|'.join(re.escape(p) for Site_File in Site_Files for p in self.ini[Site_File]['path_patterns'].split(',')))
+        Routed = {Site_File:[] for Site_File in Site_Files}
+        dirs = [self.ini['Paths']['datadump'].replace('SITE',self.site_name)]
+        while len(dirs)>0:
+            dir = dirs.pop()
+            try:
+                entries = os.scandir(dir)
+            except OSError:
+                print(f'Could not scan {dir}')
+                continue
+            with entries:
+                for entry in entries:
+                    # Subfolders are joined as os.walk does, so paths (and manifest keys) keep the same form
+                    if entry.is_dir(follow_symlinks=False):
+                        dirs.append(os.path.join(dir,entry.name))
+                        continue
+                    elif entry.is_dir():
+                        # Links to folders aren't followed (as in os.walk), which also avoids loops
+                        continue
+                    fn = f"{dir}/{entry.name}"
+                    if any_pattern.search(fn) is None:
+                        continue
+                    for Site_File,matcher in matchers.items():
+                        if matcher.match(fn):
+                            Routed[Site_File].append(fn)
+        for Site_File in Site_Files:
+            Routed[Site_File].sort()
+        return(Routed)
+
+    def findFiles(self,files):
+        with Instrumentation.stage('manifest') as stage:
+            self.readManifest()
+            self.bytes_hashed = 0
+            files = [fn for fn in files if self.checkManifest(fn)]
+            stage.add(records=len(files),bytes_read=self.bytes_hashed)
+        if len(files) == 0:
+            print(f'No new files for {self.Site_File}')
+            self.writeManifest()
+            return
+        T1 = time.time()
+        with Instrumentation.stage('parse') as stage:
+            self.parseFiles(files)
+            stage.add(records=self.Data.shape[0],bytes_read=sum(self.Manifest[fn]['size'] for fn in files))
+        print(f'Parsed {len(files)} files for {self.Site_File} ({len(files)/max(time.time()-T1,1e-9):.1f} files/s)')
+        if self.Data.empty:
+            print(f'No data in new files for {self.Site_File}')
+            self.writeManifest()
+            return
+        with Instrumentation.stage('timestamp') as stage:
+            self.dateIndex()
+            stage.add(records=self.Data.shape[0])
         if self.ini[self.Site_File]['Exclude'] != '':
             self.Metadata = self.Metadata.drop(columns=self.ini[self.Site_File]['Exclude'].split(','))     
             self.Data = self.Data.drop(columns=self.ini[self.Site_File]['Exclude'].split(','))
         self.FullYear()
+        self.Updated[self.site_name] = self.Data.index.union(self.Updated.get(self.site_name,pd.DatetimeIndex([])))
+        # Only recorded once the traces are written, so an interrupted run will pick the files up again
+        self.writeManifest()
+
+    def readManifest(self):
+        # The manifest records (size, mtime_ns, hash) by path for each file already ingested by this section
+        # mtime is kept as integer nanoseconds so it survives the round trip through the csv exactly
+        self.manifest_file = self.ini['Paths']['manifest'].replace('SITE',self.site_name)+self.Site_File+'.csv'
+        if self.incremental == True and os.path.isfile(self.manifest_file):
+            Manifest = pd.read_csv(self.manifest_file,index_col='path')
+            if 'mtime_ns' not in Manifest.columns:
+                # Older manifests stored a float mtime, those files are re-hashed (but not re-ingested) once
+                Manifest['mtime_ns'] = -1
+            Manifest['mtime_ns'] = Manifest['mtime_ns'].fillna(-1).astype('int64')
+            self.Manifest = Manifest[['size','mtime_ns','hash']].to_dict('index')
+        else:
+            self.Manifest = {}
 
-    def readSingle(self,fn):
-        if self.ini[self.Site_File]['Header_Row'] != '':
-            header = pd.read_csv(fn,skiprows=int(self.ini[self.Site_File]['Header_Row']),nrows=int(self.ini[self.Site_File]['First_Data_Row'])-int(self.ini[self.Site_File]['Header_Row']))
-            self.Metadata = pd.concat([self.Metadata,header],axis=0)
-            headers = header.columns
+    def checkManifest(self,fn):
+        # Returns True if the file is new or its contents have changed since it was last ingested
+        stat = os.stat(fn)
+        entry = self.Manifest.get(fn)
+        if entry is not None and entry['size'] == stat.st_size and entry['mtime_ns'] == stat.st_mtime_ns:
+            return(False)
+        self.bytes_hashed += stat.st_size
+        md5 = hashlib.md5()
+        with open(fn,'rb') as f:
+            for chunk in iter(lambda: f.read(1<<20),b''):
+                md5.update(chunk)
+        self.Manifest[fn] = {'size':stat.st_size,'mtime_ns':stat.st_mtime_ns,'hash':md5.hexdigest()}
+        return(entry is None or entry['hash'] != md5.hexdigest())
+
+    def writeManifest(self):
+        # Write to a temporary file first, then swap it in place
+        if os.path.isdir(os.path.split(self.manifest_file)[0])==False:
+            os.makedirs(os.path.split(self.manifest_file)[0])
+        Manifest = pd.DataFrame.from_dict(self.Manifest,orient='index',columns=['size','mtime_ns','hash'])
+        Manifest.index.name = 'path'
+        Manifest.to_csv(self.manifest_file+'.tmp')
+        os.replace(self.manifest_file+'.tmp',self.manifest_file)
+
+    def parseFiles(self,files):
+        # Files are parsed in a process pool (if configured) then merged with a single concatenation
+        # Records with duplicate timestamps (e.g., overlapping downloads) are collapsed in dateIndex
+        parse = partial(parseFile,
+                        Subtable_id=self.ini[self.Site_File]['Subtable_id'],
+                        Header_Row=self.ini[self.Site_File]['Header_Row'],
+                        Header_list=self.ini[self.Site_File]['Header_list'],
+                        Header_units=self.ini[self.Site_File]['Header_units'],
+                        First_Data_Row=self.ini[self.Site_File]['First_Data_Row'],
+                        Date_Cols=self.ini[self.Site_File]['Date_Cols'],
+                        Date_Fmt=self.ini[self.Site_File]['Date_Fmt'],
+                        Trace_dtype=self.ini['Database']['Trace_dtype'])
+        processes = self.ini.getint('Multi_Processing','processes',fallback=1)
+        # Small batches (e.g. daily updates) aren't worth the cost of starting the pool
+        if processes > 1 and len(files) > processes*8:
+            with Pool(processes=processes) as pool:
+                out = pool.map(parse,files,chunksize=max(1,len(files)//(processes*4)))
         else:
-            headers = self.ini[self.Site_File]['Header_list'].split(',')
-            units = self.ini[self.Site_File]['Header_units'].split(',')
-            header = pd.DataFrame(columns=headers)
-            header.iloc[0] = units
-            self.Metadata = pd.concat([self.Metadata,header],axis=0)
-        Data = pd.read_csv(fn,skiprows=int(self.ini[self.Site_File]['First_Data_Row']),header=None)
-        Data.columns=headers
-        self.Data = pd.concat([self.Data,Data],axis=0)
-
-    def readSubTables(self,fn):
-        # Read the file - if the first row is corrupted, it will be dropped
+            out = [parse(fn) for fn in files]
+        self.Data = pd.concat([Data for Data,_ in out],axis=0,ignore_index=True)
+        self.Metadata = pd.concat([Metadata for _,Metadata in out],axis=0).drop_duplicates()
+
+
+# Header layouts already parsed by this process, keyed by the raw text of the header rows
+Header_Cache = {}
+
+def parseFile(fn,Subtable_id,Header_Row,Header_list,Header_units,First_Data_Row,Date_Cols,Date_Fmt,Trace_dtype):
+    # Parse a single file, returns (Data,Metadata)
+    # Defined at the module level so it can be mapped over a process pool
+    if os.path.splitext(fn)[1].lower() in ['.parquet','.feather','.npz']:
+        # Binary exports carry their own header, units, and datetime index
+        Data = ReadDatabase.readOutput(fn)
+        columns = [Data.index.name]+list(Data.columns)
+        header = pd.DataFrame(columns=columns,index=[0],data=[[Data.attrs['units'].get(c,'') for c in columns]])
+        return(Data.reset_index(),header)
+    elif Subtable_id == '':
+        return(readSingle(fn,Header_Row,Header_list,Header_units,First_Data_Row,Date_Cols,Date_Fmt,Trace_dtype))
+    else:
+        return(readSubTables(fn,Subtable_id,Header_list,Header_units))
+
+def readSingle(fn,Header_Row,Header_list,Header_units,First_Data_Row,Date_Cols,Date_Fmt,Trace_dtype):
+    First_Data_Row = int(First_Data_Row)
+    if Header_Row != '':
+        # Only parse the header (and units) rows the first time a layout is encountered
+        with open(fn) as f:
+            lines = ''.join(f.readline() for i in range(First_Data_Row))
+        if lines not in Header_Cache:
+            Header_Cache[lines] = pd.read_csv(io.StringIO(lines),skiprows=int(Header_Row))
+        header = Header_Cache[lines]
+        headers = list(header.columns)
+    else:
+        headers = Header_list.split(',')
+        header = pd.DataFrame(columns=headers,data=[Header_units.split(',')],index=[0])
+    # Traces are read directly as Trace_dtype with the C parser, date columns are parsed in dateIndex
+    Date_Cols = Date_Cols.split(',')
+    dtype = {}
+    for i,h in enumerate(headers):
+        if h not in Date_Cols:
+            dtype[i] = Trace_dtype
+        elif Date_Fmt == 'Auto':
+            dtype[i] = str
+        else:
+            dtype[i] = 'float64'
+    try:
+        Data = pd.read_csv(fn,skiprows=First_Data_Row,header=None,dtype=dtype,na_values=['NAN'],engine='c')
+    except ValueError:
+        # Fall back to type inference if any column is not numeric
+        Data = pd.read_csv(fn,skiprows=First_Data_Row,header=None,na_values=['NAN'],engine='c')
+    Data.columns=headers
+    return(Data,header)
+
+def readSubTables(fn,Subtable_id,Header_list,Header_units,NA_values=[-6999,6999]):
+    # Parser for Campbell CR10X style mixed-record files, where each line starts with its subtable (array) id
+    # The file is read once and the lines are split by id in a single pass, then each subtable is parsed with its own layout
+    # Subtables can have different widths, and short rows within a subtable are padded with NaN
+    Subtables = {Id:(headers.split(','),units.split(',')) for Id,headers,units in zip(Subtable_id.split('|'),Header_list.split('|'),Header_units.split('|'))}
+    col_num = Header_list.split('|')[0].split(',').index('Subtable_id')
+    with open(fn,'rb') as f:
+        lines = f.read().splitlines()
+    Groups = {Id.encode():[] for Id in Subtables}
+    for line in lines:
+        Id = line.split(b',',col_num+1)[col_num].strip()
+        if Id in Groups:
+            Groups[Id].append(line)
+    # The first line is often a partial record (file cut mid-line), drop it if it is shorter than the next record of its subtable
+    if len(lines)>0:
+        Id = lines[0].split(b',',col_num+1)[col_num].strip()
+        if Id in Groups and len(Groups[Id])>1 and Groups[Id][0] is lines[0] and lines[0].count(b',') < Groups[Id][1].count(b','):
+            Groups[Id] = Groups[Id][1:]
+    Data_Out,Metadata = [],[]
+    for Id,(headers,units) in Subtables.items():
+        Group = Groups[Id.encode()]
+        if len(Group) == 0:
+            continue
+        width = max(line.count(b',') for line in Group)+1
+        if width<len(headers):
+            headers = headers[:width]
+            units = units[:width]
+        keep = [i for i,h in enumerate(headers) if h != '_']
+        text = io.BytesIO(b'\n'.join(Group))
         try:
-            Data = pd.read_csv(fn,header=None,na_values=[-6999,6999])
-        except:
-            Data = pd.read_csv(fn,header=None,na_values=[-6999,6999],skiprows=1)
-            First = pd.read_csv(fn,header=None,na_values=[-6999,6999],nrows=1)
-            pass
-        for Subtable_id,headers,units in zip(self.ini[self.Site_File]['Subtable_id'].split('|'),self.ini[self.Site_File]['Header_list'].split('|'),self.ini[self.Site_File]['Header_units'].split('|')):
-            headers = headers.split(',')
-            units = units.split(',')
-            if Data.shape[1]<len(headers):
-                headers = headers[:Data.shape[1]]
-                units = units[:Data.shape[1]]
-            header = pd.DataFrame(columns=headers,data=[units],index=[0])
-            header.iloc[0] = units
-            
-            self.col_num = headers.index('Subtable_id')
-            Subtable = Data.loc[Data[self.col_num].astype(str)==Subtable_id]
-            Subtable = Subtable[Subtable.columns[0:len(headers)]]
-            drop = []
-            for i,v in enumerate(headers):
-                if v == '_':
-                    drop.append(i)
-            try:
-                header = header.drop(columns=['_'])
-            except:
-                pass
-            self.Metadata = pd.concat([self.Metadata,header],axis=0)
-            Subtable = Subtable.drop(columns=drop)
-            Subtable.columns=header.columns
-            self.Data = pd.concat([self.Data,Subtable],axis=0)
-        
+            Subtable = pd.read_csv(text,header=None,names=range(max(width,len(headers))),usecols=keep,dtype='float64',engine='c')
+        except ValueError:
+            # Corrupted values are set to NaN (without re-reading the file)
+            text.seek(0)
+            Subtable = pd.read_csv(text,header=None,names=range(max(width,len(headers))),usecols=keep,dtype=str,engine='c')
+            Subtable = Subtable.apply(pd.to_numeric,errors='coerce')
+        Subtable = Subtable.mask(Subtable.isin(NA_values))
+        Subtable.columns = [headers[i] for i in keep]
+        Data_Out.append(Subtable)
+        Metadata.append(pd.DataFrame(columns=Subtable.columns,data=[[units[i] for i in keep]],index=[0]))
+    if len(Data_Out) == 0:
+        return(pd.DataFrame(),pd.DataFrame())
+    return(pd.concat(Data_Out,axis=0,ignore_index=True),pd.concat(Metadata,axis=0))
+
 
 class GSheetDump(Write):
     def __init__(self, ini='WriteTraces_Gsheets.ini'):
@@ -166,9 +438,6 @@ class GSheetDump(Write):
 
 
 if __name__ == '__main__':
-    file_path = os.path.split(__file__)[0]
-    os.chdir(file_path)
-
     CLI=argparse.ArgumentParser()
     CLI.add_argument(
     "--ini",  # name on the CLI - drop the `--` for positional/required parameters
@@ -176,6 +445,12 @@ if __name__ == '__main__':
     type=str,
     default='WriteTraces.ini',  # default if nothing is provided
     )
+
+    CLI.add_argument(
+    "--full",
+    action='store_true',
+    help='Ignore the manifest and re-ingest every file',
+    )
     
     args = CLI.parse_args()
-    MakeTraces(args.ini)
\ No newline at end of file
+    MakeTraces(args.ini,incremental=not args.full)
\ No newline at end of file
@@ -0,0 +1 @@
+# Functions to read from and write to the Biomet database
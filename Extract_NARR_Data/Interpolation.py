@@ -2,34 +2,32 @@ import os
 import sys
 import numpy as np
 import pandas as pd
-import netCDF4 as nc
-import urllib.request
-import geopandas as gpd
 import argparse
-import folium
 import configparser
 from datetime import timedelta
-from scipy.interpolate import RBFInterpolator
 import datetime
 
-# A "Hack" to add append MicrometPy to they path variable
-# Wont be needed once I can turn this into a proper package
-file_path = os.path.split(__file__)[0]
-os.chdir(file_path)
-os.chdir('..')
-MicrometPy = os.getcwd()
-if MicrometPy not in sys.path:
-    sys.path.insert(-1,MicrometPy)
-from Biomet_Database_Functions import WriteDatabase
-os.chdir(file_path)
+# netCDF4, geopandas, folium and scipy are only imported by the methods that use them
+if __package__ in [None,'']:
+    # Run as a script, make the other MicrometPy packages importable
+    sys.path.insert(0,os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from Biomet_Database_Functions import ReadDatabase
+from Biomet_Database_Functions import Instrumentation
+
+# WKT description of the NARR LCC projection
+# Source: https://spatialreference.org/ref/sr-org/8214/
+NARR_LCC = '+proj=lcc +lat_1=50 +lat_0=50 +lon_0=-107 +k_0=1 +x_0=5632642.22547 +y_0=4612545.65137 +a=6371200 +b=6371200 +units=m +no_defs'
 
 class PointSampleNARR():
     
-    def __init__(self,Site,Years,verbose=0):
-        self.ini = configparser.ConfigParser()
-        self.ini.read('../MicrometPy.ini')
-        self.ini.read('configuration.ini')
-        self.ini.read(f'../site_configurations/{Site}.ini')
+    def __init__(self,Site,Years,verbose=0,ini=[]):
+        import geopandas as gpd
+        self.base = os.path.dirname(os.path.abspath(__file__))
+        # Any additional configs (ini) are read last, e.g. to override [Downloads] or [Outputs]
+        self.ini = ReadDatabase.readConfig(['configuration.ini',f'{ReadDatabase.MicrometPy}/site_configurations/{Site}.ini']+list(ini),self.base)
+        # Relative paths in the configuration are relative to this folder
+        self.ini['Downloads']['nc_path'] = ReadDatabase.modulePath(self.ini['Downloads']['nc_path'],self.base)
+        self.ini['Outputs']['template'] = ReadDatabase.modulePath(self.ini['Outputs']['template'],self.base)
         self.verbose = verbose
         
         inv = self.ini["Downloads"]["nc_path"]+'inventory.csv'
@@ -50,9 +48,6 @@ class PointSampleNARR():
             df, geometry=gpd.points_from_xy(df.lon, df.lat), crs="EPSG:4326"
         )
         
-        # WKT description of the NARR LCC projection
-        # Source: https://spatialreference.org/ref/sr-org/8214/
-        NARR_LCC = '+proj=lcc +lat_1=50 +lat_0=50 +lon_0=-107 +k_0=1 +x_0=5632642.22547 +y_0=4612545.65137 +a=6371200 +b=6371200 +units=m +no_defs'
         self.Site = self.Site.to_crs(NARR_LCC)
         
         Vars = self.ini['Downloads']['var_name'].split(',')
@@ -62,15 +57,15 @@ class PointSampleNARR():
         if self.ini['Outputs']['datadump']=='True':
             self.out_dir = self.ini['Paths']['datadump'].replace('SITE',self.site_name)+'/'+self.ini['Outputs']['folder_name']
         else:
-            self.out_dir = self.ini['Outputs']['datadump'].replace('SITE',self.site_name)+'/'+self.ini['Outputs']['folder_name']
+            self.out_dir = ReadDatabase.modulePath(self.ini['Outputs']['datadump'].replace('SITE',self.site_name),self.base)+'/'+self.ini['Outputs']['folder_name']
+
 
+        self.fmt = self.ini['Outputs'].get('format','csv').lower()
 
         for self.var_name in Vars:
-            if os.path.isfile(f'{self.out_dir}/{self.var_name}.csv'):
-                self.Trace = pd.read_csv(f'{self.out_dir}/{self.var_name}.csv',
-                                parse_dates=[self.ini['Site_Info']['timestamp']],
-                                index_col=self.ini['Site_Info']['timestamp']
-                                )
+            fn = f'{self.out_dir}/{self.var_name}{ReadDatabase.Output_Formats[self.fmt]}'
+            if os.path.isfile(fn):
+                self.Trace = ReadDatabase.readOutput(fn,self.ini['Site_Info']['timestamp'])
             else:
                 self.Trace = pd.DataFrame()
             # YD=self.Trace.resample('Y')[self.var_name].count()
@@ -97,9 +92,12 @@ class PointSampleNARR():
             
             if os.path.isdir(self.out_dir) is False: os.makedirs(self.out_dir)
             self.Trace = self.Trace[self.Trace.index.duplicated()==False].sort_index()
-            self.Trace.to_csv(f'{self.out_dir}/{self.var_name}.csv')
+            out = ReadDatabase.Output(fn,self.fmt)
+            out.write(self.Trace)
+            out.close()
             
             if self.ini['Outputs']['biomet_database'] == 'True':
+                from Biomet_Database_Functions import WriteDatabase
                 print('Write')
 
                 writer = configparser.ConfigParser()
@@ -109,7 +107,7 @@ class PointSampleNARR():
                 
                 with open(self.ini['Outputs']['template'], 'w') as configfile:    # save
                     writer.write(configfile)
-                WriteDatabase.MakeTraces(os.getcwd()+'/'+self.ini['Outputs']['template'])
+                WriteDatabase.MakeTraces(self.ini['Outputs']['template'])
 
         self.inventory.to_csv(inv,index=False)
 
@@ -132,19 +130,25 @@ class PointSampleNARR():
     
     def download(self):
         # Downloads annual NARR data for a desired variable
+        import urllib.request
         url = self.ini["Downloads"]["NARR_URL"].replace('_YEAR_',str(self.year)).replace('_VAR_NAME_',self.var_name)
-        urllib.request.urlretrieve(url, f'{self.ini["Downloads"]["nc_path"]}/{self.var_name}_{self.year}.nc')
-
-    def read(self,fn):        
-        ds = nc.Dataset(f'{self.ini["Downloads"]["nc_path"]}/{fn}')
-        self.lon = np.ma.getdata(ds.variables['lon'][:])
-        self.lat = np.ma.getdata(ds.variables['lat'][:])
-        self.x = np.ma.getdata(ds.variables['x'][:])
-        self.y = np.ma.getdata(ds.variables['y'][:])
-        self.time = ds.variables['time']
-        self.time = nc.num2date(self.time[:], self.time.units,calendar = 'standard',only_use_cftime_datetimes=False)
-        # self.time = pd.to_datetime(self.time)+timedelta(hours=tz_offset)
-        self.var = np.ma.getdata(ds.variables[self.var_name][:])
+        with Instrumentation.stage('narr_download') as stage:
+            urllib.request.urlretrieve(url, f'{self.ini["Downloads"]["nc_path"]}/{self.var_name}_{self.year}.nc')
+            stage.add(bytes_written=os.path.getsize(f'{self.ini["Downloads"]["nc_path"]}/{self.var_name}_{self.year}.nc'))
+
+    def read(self,fn):
+        import netCDF4 as nc
+        with Instrumentation.stage('narr_read') as stage:
+            ds = nc.Dataset(f'{self.ini["Downloads"]["nc_path"]}/{fn}')
+            self.lon = np.ma.getdata(ds.variables['lon'][:])
+            self.lat = np.ma.getdata(ds.variables['lat'][:])
+            self.x = np.ma.getdata(ds.variables['x'][:])
+            self.y = np.ma.getdata(ds.variables['y'][:])
+            self.time = ds.variables['time']
+            self.time = nc.num2date(self.time[:], self.time.units,calendar = 'standard',only_use_cftime_datetimes=False)
+            # self.time = pd.to_datetime(self.time)+timedelta(hours=tz_offset)
+            self.var = np.ma.getdata(ds.variables[self.var_name][:])
+            stage.add(records=self.time.shape[0],bytes_read=os.path.getsize(f'{self.ini["Downloads"]["nc_path"]}/{fn}'))
         if self.verbose == 1:
             print(ds)
         if self.inventory['file'].str.contains(fn).sum()==0:
@@ -156,6 +160,7 @@ class PointSampleNARR():
         # Values are interpolated spatially using a radial bias function and saved to a dataframe for each point
         # Then values for each point are linearly interpolated resampled to the desired temporal resolution 
         # Saved to Outputs/NARR_interpolated_{self.var_name}_{self.year}.csv'
+        import folium
         
         bbox = self.Site.total_bounds
         
@@ -184,8 +189,10 @@ class PointSampleNARR():
         TS[self.ini['Site_Info']['timestamp']] = pd.to_datetime(self.time)+timedelta(hours=int(self.ini['Site_Info']['utc_offset']))
         
         TS[self.var_name]=np.nan
-        for i,row in TS.iterrows():
-            TS.loc[TS.index == i, self.var_name] = self.interpolate(self.var_clip[i].flatten())
+        with Instrumentation.stage('rbf') as stage:
+            for i,row in TS.iterrows():
+                TS.loc[TS.index == i, self.var_name] = self.interpolate(self.var_clip[i].flatten())
+            stage.add(records=TS.shape[0])
         TS = TS.set_index(self.ini['Site_Info']['timestamp'])
         TS = TS.resample(freq).asfreq()
         TS[self.var_name+'_interp_linear'] = TS[self.var_name].interpolate(method='linear')
@@ -198,12 +205,11 @@ class PointSampleNARR():
     def interpolate(self,val):
         # Interpolates value from grid (xy) to desired points (coords) using a Radial Bias Function
         # Default behavior is to use a thin plate spline function r**2 * log(r)
+        from scipy.interpolate import RBFInterpolator
         return(RBFInterpolator(self.xy, val,kernel='linear')(self.coords))
 
 
 if __name__ == '__main__':
-    file_path = os.path.split(__file__)[0]
-    os.chdir(file_path)
     # If called from command line, parse the arguments
     
     CLI=argparse.ArgumentParser()
@@ -0,0 +1 @@
+# Interpolate NARR reanalysis data to site locations
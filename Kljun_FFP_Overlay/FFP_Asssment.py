@@ -1,30 +1,61 @@
 # Wrapper for the Klujn et al. 2015 flux footprint model
 
 import os
-import utm_zone
+import sys
+import time
+import hashlib
 import numpy as np
 import pandas as pd
-import configparser
-import geopandas as gpd
 from functools import partial
-import matplotlib.pyplot as plt
 from multiprocessing import Pool
-from Klujn_2015_Model import FFP
-from shapely.geometry import Polygon
 
-import rasterio
-from rasterio import features
-from rasterio.transform import from_origin
+# The geospatial stack (geopandas, rasterio, shapely, matplotlib, utm_zone) is only imported by the methods that use it
+if __package__ in [None,'']:
+    # Run as a script, make the other MicrometPy packages importable
+    sys.path.insert(0,os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from Klujn_2015_Model import FFP, FFP_Scaled, footprintScales
+else:
+    from .Klujn_2015_Model import FFP, FFP_Scaled, footprintScales
+from Biomet_Database_Functions import ReadDatabase
+from Biomet_Database_Functions import Instrumentation
 
 class RunClimatology():
 
-    def __init__(self,Site,Date_Range_Set=None,Time_Range_Set=None):
+    vars = {
+        'canopy_height':'canopy_height',# - can be float or array (m)
+        'h':'hpbl_interp_spline',# - height of planetary boundary layer (m)
+        'ol':'L',# - Obukhov length (m)
+        'sigmav':'V_SIGMA',# - standard deviation of horizontal wind (m/s)
+        'ustar':'USTAR',# - friction velocity (m/s)
+        'wind_dir':'wind_dir',# - wind direction in degrees from north (deg)
+    }
+
+    vars_metadata = {
+        'canopy_height':'Time series: of plant canopy height array (m)',
+        'h':'Time series: height of planetary boundary layer (m)',
+        'ol':'Time series: Obukhov length (m)',
+        'sigmav':'Time series: standard deviation of horizontal wind (m/s)',
+        'ustar':'Time series: friction velocity (m/s)',
+        'wind_dir':'Time series: wind direction in degrees from north (deg)',
+    }
+
+    def __init__(self,Site,Date_Range_Set=None,Time_Range_Set=None,Years=None,ini=[]):
         self.Date_Range_Set=Date_Range_Set
         self.Time_Range_Set=Time_Range_Set
-        self.ini = configparser.ConfigParser()
-        self.ini.read('../MicrometPy.ini')
-        self.ini.read('configuration.ini')
-        self.ini.read(f'../site_configurations/{Site}.ini')
+        self.Years=Years
+        import utm_zone
+        import geopandas as gpd
+        base = os.path.dirname(os.path.abspath(__file__))
+        # Any additional ini files (e.g., a custom database path) are read last
+        # They are resolved here (working directory, then this folder) so the database reads see the same files
+        if type(ini) is str:
+            ini = [ini]
+        self.ini_files = [i if os.path.isfile(i) else ReadDatabase.modulePath(i,base) for i in ini]
+        self.ini = ReadDatabase.readConfig(['configuration.ini',f'{ReadDatabase.MicrometPy}/site_configurations/{Site}.ini']+self.ini_files,base)
+        # Relative paths in the configuration are relative to this folder
+        for section,key in [('Input','MapTemplate'),('Output','RasterOutput'),('Output','ShapefileOutput'),('Output','WebmapOutput'),
+                            ('Site_Info','dpath'),('Site_Info','basemap')]:
+            self.ini[section][key] = ReadDatabase.modulePath(self.ini[section][key],base)
 
         self.Name = Site
         # inis = ['config_files/FFP.ini',f'config_files/site_specific/{Site}.ini']
@@ -78,7 +109,13 @@ class RunClimatology():
 
 
         # basemap is an optional input, requires a 'path to vector layer' pluss a 'classification' key
-        self.rasterizeBasemap(self.ini['Site_Info']['basemap'],self.ini['Site_Info']['basemap_class'])
+        with Instrumentation.stage('basemap'):
+            self.rasterizeBasemap(self.ini['Site_Info']['basemap'],self.ini['Site_Info']['basemap_class'])
+
+        # Basemap-only runs can interpolate the class fractions from a precomputed table instead of evaluating FFP for each record
+        self.lookup = self.ini.getboolean('Lookup','enabled',fallback=False) and len(self.Fc_Names) > 0
+        if self.lookup:
+            self.loadLookup()
 
         # ==================================
         # Define input keys
@@ -86,24 +123,6 @@ class RunClimatology():
         self.read_Met()
         
     def read_Met(self):
-
-        self.vars = {
-            'canopy_height':'canopy_height',# - can be float or array (m)
-            'h':'hpbl_interp_spline',# - height of planetary boundary layer (m)
-            'ol':'L',# - Obukhov length (m)
-            'sigmav':'V_SIGMA',# - standard deviation of horizontal wind (m/s)
-            'ustar':'USTAR',# - friction velocity (m/s)
-            'wind_dir':'wind_dir',# - wind direction in degrees from north (deg)
-        }
-
-        self.vars_metadata = {
-            'canopy_height':'Time series: of plant canopy height array (m)',
-            'h':'Time series: height of planetary boundary layer (m)',
-            'ol':'Time series: Obukhov length (m)',
-            'sigmav':'Time series: standard deviation of horizontal wind (m/s)',
-            'ustar':'Time series: friction velocity (m/s)',
-            'wind_dir':'Time series: wind direction in degrees from north (deg)',
-        }
         
         if self.ini['FFP_Parameters']['verbose'] == "True":
             print('Requires the following inputs, expecting them to be named as specified:\n')
@@ -111,9 +130,13 @@ class RunClimatology():
                 print(self.vars_metadata[key])
                 print(f'Labelled as "{value}" in input self.dataset\n')
 
-        df = pd.read_csv(self.ini['Site_Info']['dpath'],
-                 parse_dates=[self.ini['Site_Info']['timestamp']],
-                 index_col=self.ini['Site_Info']['timestamp'])
+        if self.ini['Input']['source'] == 'database':
+            df = self.read_Database()
+        else:
+            # Accepts any of the database export formats (.csv, .parquet, .feather, .npz)
+            with Instrumentation.stage('read') as stage:
+                df = ReadDatabase.readOutput(self.ini['Site_Info']['dpath'],self.ini['Site_Info']['timestamp'])
+                stage.add(records=df.shape[0],bytes_read=os.path.getsize(self.ini['Site_Info']['dpath']))
 
         df.dropna(how='all')
 
@@ -148,10 +171,34 @@ class RunClimatology():
             for c in self.Fc_Names:
                 self.Subset[c] = self.Subset[c].fillna(self.data[c])
         
-        self.summarizeClimatology()
-
+        # There is no 2D footprint to summarize when the class fractions come from the lookup table
+        if self.lookup == False:
+            self.summarizeClimatology()
+
+
+    def read_Database(self):
+        # Read the inputs directly from the Biomet database (no intermediate file)
+        # Only the years requested (or spanned by the Date_Range_Set) are read
+        if self.Years is None and self.Date_Range_Set is not None:
+            Date_Range_Set = self.Date_Range_Set
+            if type(Date_Range_Set[0]) != type(Date_Range_Set):
+                Date_Range_Set = [Date_Range_Set]
+            self.Years = []
+            for Date_Range in Date_Range_Set:
+                # Midnight on Jan 1 is the last record of the previous year
+                self.Years += list(range((pd.Timestamp(Date_Range[0])-pd.Timedelta('30min')).year,(pd.Timestamp(Date_Range[1])-pd.Timedelta('30min')).year+1))
+            self.Years = sorted(set(self.Years))
+        elif self.Years is None:
+            self.Years = range(int(self.ini['Input']['first_year']),pd.Timestamp.now().year+1)
+        Traces = ReadDatabase.LoadTraces(self.Name,self.Years,self.ini['Input']['stage'],list(self.vars.values()),
+                                         Timestamp=self.ini['Site_Info']['timestamp'],ini=self.ini_files)
+        return(Traces.Data)
 
     def rasterizeBasemap(self,basemap,basemap_class):
+        import geopandas as gpd
+        import rasterio
+        from rasterio import features
+        from rasterio.transform import from_origin
         x,y = self.Site_UTM.geometry.x[0],self.Site_UTM.geometry.y[0]
         west = x-(self.nx*self.dx)/2
         north = y+(self.nx*self.dx)/2
@@ -196,7 +243,10 @@ class RunClimatology():
         self.Filter()
         print(f"Processing: {self.data.loc[self.data['process']==1].shape[0]} out of {self.data.shape[0]} input records")
 
-        if (__name__ == 'FFP_Asssment' or __name__ == '__main__') and int(self.ini['Multi_Processing']['processes'])>1:
+        if self.lookup:
+            self.runLookup()
+
+        elif (__name__.split('.')[-1] == 'FFP_Asssment' or __name__ == '__main__') and int(self.ini['Multi_Processing']['processes'])>1:
             
             batchsize=int(np.ceil(self.data.shape[0]))
             if batchsize > int(self.ini['Multi_Processing']['BatchSize']):
@@ -217,20 +267,100 @@ class RunClimatology():
                 ix += batchsize
                 
                 with Pool(processes=int(self.ini['Multi_Processing']['processes'])) as pool:
-                    for out in pool.starmap(partial(FFP,theta=self.theta,rho=self.rho,x_2d=self.x_2d,basemap=self.baseRaster),
-                                        zip(index,ustar,sigmav,h,ol,wind_dir,z0,zm)):
-                        self.processOutputs(out)
+                    # CPU time is spent in the workers, so only the wall time of the footprint stage is meaningful here
+                    with Instrumentation.stage('footprint') as stage:
+                        outs = pool.starmap(partial(FFP,theta=self.theta,rho=self.rho,x_2d=self.x_2d,basemap=self.baseRaster),
+                                            zip(index,ustar,sigmav,h,ol,wind_dir,z0,zm))
+                        stage.add(records=len(outs))
+                    with Instrumentation.stage('accumulate') as stage:
+                        for out in outs:
+                            self.processOutputs(out)
+                        stage.add(records=len(outs))
                     pool.close()
 
         else:
             for i,row in self.data.iterrows():
-                out = FFP(i,row[self.vars['ustar']],row[self.vars['sigmav']],row[self.vars['h']],
-                    row[self.vars['ol']],row[self.vars['wind_dir']],row['z0'],row['zm-d'],
-                    self.theta,self.rho,self.x_2d,basemap=self.baseRaster)
-                self.processOutputs(out)
+                with Instrumentation.stage('footprint') as stage:
+                    out = FFP(i,row[self.vars['ustar']],row[self.vars['sigmav']],row[self.vars['h']],
+                        row[self.vars['ol']],row[self.vars['wind_dir']],row['z0'],row['zm-d'],
+                        self.theta,self.rho,self.x_2d,basemap=self.baseRaster)
+                    stage.add(records=1)
+                with Instrumentation.stage('accumulate') as stage:
+                    self.processOutputs(out)
+                    stage.add(records=1)
 
         
 
+    def loadLookup(self):
+        # Class contributions over (wind direction, Lx, Ly) for this basemap and grid, built the first time they're needed
+        # Tables are stored per site and grid configuration and rebuilt if the basemap or the table axes change
+        from scipy.interpolate import RegularGridInterpolator
+        Lookup = self.ini['Lookup']
+        wind_dir = np.arange(0,360,float(Lookup['wind_dir_step']))
+        Lx = np.geomspace(*[float(v) for v in Lookup['Lx_range'].split(',')],int(Lookup['Lx_n']))
+        Ly = np.geomspace(*[float(v) for v in Lookup['Ly_range'].split(',')],int(Lookup['Ly_n']))
+        key = hashlib.md5(np.nan_to_num(self.baseRaster,nan=0).astype('int16').tobytes()+wind_dir.tobytes()+Lx.tobytes()+Ly.tobytes()).hexdigest()
+        self.lookup_file = f"{ReadDatabase.modulePath(Lookup['path'],os.path.dirname(os.path.abspath(__file__)))}{self.Name}_Fc_Lookup_{self.dx}m_{self.domain}m.npz"
+        self.validate = False
+        if os.path.isfile(self.lookup_file) and str(np.load(self.lookup_file)['key']) == key:
+            Table = np.load(self.lookup_file)['table']
+        else:
+            print(f'Building class lookup table for {self.Name} ({wind_dir.shape[0]*Lx.shape[0]*Ly.shape[0]} footprints)')
+            T1 = time.time()
+            build = partial(classContributions,Lx=Lx,Ly=Ly,theta=self.theta,rho=self.rho,basemap=self.baseRaster,n_classes=len(self.Fc_Names))
+            processes = int(self.ini['Multi_Processing']['processes'])
+            with Instrumentation.stage('lookup_build') as stage:
+                if (__name__.split('.')[-1] == 'FFP_Asssment' or __name__ == '__main__') and processes > 1:
+                    with Pool(processes=processes) as pool:
+                        Table = np.stack(pool.map(build,wind_dir))
+                else:
+                    Table = np.stack([build(wd) for wd in wind_dir])
+                stage.add(records=Table.shape[0]*Table.shape[1]*Table.shape[2],bytes_written=Table.nbytes)
+            print(f'Built in {time.time()-T1:.1f} s')
+            np.savez(self.lookup_file,key=key,table=Table,wind_dir=wind_dir,Lx=Lx,Ly=Ly,Fc_Names=self.Fc_Names)
+            # Checked against FFP with the first records processed
+            self.validate = True
+        # Wind direction wraps around so interpolation between the last step and 360 is periodic
+        self.Table = RegularGridInterpolator((np.append(wind_dir,360),np.log(Lx),np.log(Ly)),np.concatenate([Table,Table[:1]]),
+                                             bounds_error=False,fill_value=np.nan)
+
+    def runLookup(self):
+        # Class fractions interpolated from the lookup table, records outside the table are evaluated with FFP
+        Lx,Ly = footprintScales(self.data[self.vars['ustar']],self.data[self.vars['sigmav']],self.data[self.vars['h']],
+                                self.data[self.vars['ol']],self.data['z0'],self.data['zm-d'])
+        with Instrumentation.stage('lookup') as stage, np.errstate(all='ignore'):
+            Fc = self.Table(np.stack([self.data[self.vars['wind_dir']]%360,np.log(Lx),np.log(Ly)],axis=1))
+            stage.add(records=Fc.shape[0])
+        inside = np.isfinite(Fc).all(axis=1)
+        self.data.loc[inside,self.Fc_Names] = Fc[inside,:-1]
+        self.data.loc[inside,f'Contribution within {self.domain} m'] = Fc[inside,-1]
+        for i,row in self.data.loc[~inside].iterrows():
+            out = FFP(i,row[self.vars['ustar']],row[self.vars['sigmav']],row[self.vars['h']],
+                row[self.vars['ol']],row[self.vars['wind_dir']],row['z0'],row['zm-d'],
+                self.theta,self.rho,self.x_2d,basemap=self.baseRaster)
+            with Instrumentation.stage('accumulate'):
+                self.processOutputs(out)
+        if self.validate:
+            self.validateLookup(self.data.loc[inside])
+            self.validate = False
+
+    def validateLookup(self,data):
+        # Compare the interpolated class fractions to FFP for a random sample of records
+        # The report (absolute error by class) is written next to the table
+        sample = data.sample(n=min(data.shape[0],int(self.ini['Lookup']['validation_n'])),random_state=0)
+        Error = []
+        for i,row in sample.iterrows():
+            out = FFP(i,row[self.vars['ustar']],row[self.vars['sigmav']],row[self.vars['h']],
+                row[self.vars['ol']],row[self.vars['wind_dir']],row['z0'],row['zm-d'],
+                self.theta,self.rho,self.x_2d,basemap=self.baseRaster)
+            Error.append(np.abs(row[self.Fc_Names].values.astype('float64')-out[2][:len(self.Fc_Names)]))
+        Error = pd.DataFrame(Error,columns=self.Fc_Names)
+        Report = pd.DataFrame({'mean_abs_error':Error.mean(),'p95_abs_error':Error.quantile(.95),'max_abs_error':Error.max()})
+        Report.index.name = 'Class'
+        Report.to_csv(self.lookup_file.replace('.npz','_validation.csv'))
+        print(f'Lookup table validation against FFP ({sample.shape[0]} records):')
+        print(Report.to_string())
+
     def Filter(self):
         d = int(self.ini['FFP_Parameters']['exclude_wake'])
         b = self.Site_UTM['bearing'][0]
@@ -293,17 +423,25 @@ class RunClimatology():
         else:
             self.data.loc[self.data.index==out[0],f'Contribution within {self.domain} m']=out[1].sum()
 
-    def summarizeClimatology(self):
-        self.fclim_2d = self.fclim_2d/self.data.shape[0]
+    def summarizeClimatology(self,n=None):
+        # n is the number of footprints summed in fclim_2d, defaults to the number of records in self.data
+        import rasterio
+        if n is None:
+            n = self.data.shape[0]
+        self.fclim_2d = self.fclim_2d/n
         if self.ini['Output']['RasterOutput']!='None':
             with rasterio.open(f"{self.ini['Output']['RasterOutput']}{self.Name}_FP_Clim_{self.dx}m.tif",'w+',driver='GTiff',width = self.nx, height = self.nx,#+1,
                         count = 1,dtype=np.float32,transform = self.Transform,crs = ({'init': f'EPSG:{self.EPSG}'})) as out:
                 out.write(self.fclim_2d,1)
             
-        self.countours()
+        with Instrumentation.stage('contour') as stage:
+            self.countours()
+            stage.add(records=len(self.rs))
         
 
     def countours(self):
+        import geopandas as gpd
+        from shapely.geometry import Polygon
         pclevs = np.empty(len(self.rs))
         pclevs[:] = np.nan
         ars = np.empty(len(self.rs))
@@ -349,11 +487,10 @@ class RunClimatology():
             self.WGS.to_file(f"{self.ini['Output']['WebmapOutput']}{self.Name}_FP_Clim_Contours.geojson",driver='GeoJSON')
 
     def getGeom(self,lev):
+        import matplotlib.pyplot as plt
         cs = plt.contour(self.x_2d, self.y_2d, self.fclim_2d, [lev])
         plt.close()
         segs = cs.allsegs[0]#[0]
-        print(lev,cs.levels)
-        print()
         xr = [vert[0] for vert in segs]
         yr = [vert[1] for vert in segs]
         #Set contour to None if it's found to reach the physical domain
@@ -363,4 +500,121 @@ class RunClimatology():
         else:
             return([[x+self.Site_UTM.geometry.x[0], y+self.Site_UTM.geometry.y[0]] for x,y in zip(xr,yr)])
 
-        
\ No newline at end of file
+        
+
+
+class WatchClimatology(RunClimatology):
+    # Near-real-time mode: polls the datadump, writes new logger files to the database (WriteDatabase.MakeTraces)
+    # then computes footprints and class fractions for only the new half-hours
+    # Footprints are summed by day so the climatology outputs can be updated for a rolling window of [Watch] window_days
+    def __init__(self,Site,ini=[]):
+        super().__init__(Site,ini=ini)
+        # Ingest and the database reads use the same configs: [Watch] write_ini followed by any additional ini files,
+        # so e.g. a [Paths] override applies to both (write_ini names are resolved as WriteDatabase does)
+        base = os.path.join(ReadDatabase.MicrometPy,'Biomet_Database_Functions')
+        self.db_ini = [i if os.path.isfile(i) else ReadDatabase.modulePath(i,base) for i in self.ini['Watch']['write_ini'].split(',')]+self.ini_files
+        if self.ini['Watch'].getboolean('warm_start'):
+            self.warmStart()
+
+    def read_Met(self):
+        # Inputs are read as new half-hours arrive (see update) rather than all at once
+        self.Stages = self.ini['Watch']['stage'].split(',')
+        self.window = int(self.ini['Watch']['window_days'])
+        self.Processed = pd.DatetimeIndex([])
+        # Sum of the footprints and the number of records for each day in the window
+        self.Daily = {}
+        # Class fractions for each new half-hour are appended to a running record, which persists between runs
+        self.Fc_File = f"{self.ini['Output']['RasterOutput']}{self.Name}_Watch_Fc.csv"
+        if os.path.isfile(self.Fc_File):
+            self.Recorded = pd.read_csv(self.Fc_File,usecols=[0],index_col=0,parse_dates=True).index
+        else:
+            self.Recorded = pd.DatetimeIndex([])
+
+    def warmStart(self):
+        # Fill the window preceding the last valid record in the database, found from the trace summary sidecars
+        Years = range(int(self.ini['Input']['first_year']),pd.Timestamp.now().year+1)
+        last = pd.concat([ReadDatabase.Summary(self.Name,Years,stage,Traces=list(self.vars.values()),ini=self.db_ini).Data['last']
+                          for stage in self.Stages]).max()
+        if pd.isna(last):
+            print(f'No trace summaries for {self.Name}, starting with an empty climatology')
+            return
+        self.update(pd.date_range(last-pd.Timedelta(days=self.window)+pd.Timedelta('30min'),last,freq='30min'))
+
+    def watch(self,polls=None):
+        # Poll the datadump every [Watch] poll_interval seconds, indefinitely or for a fixed number of polls
+        interval = float(self.ini['Watch']['poll_interval'])
+        i = 0
+        while polls is None or i < polls:
+            T1 = time.time()
+            self.poll()
+            i += 1
+            if polls is None or i < polls:
+                time.sleep(max(0,interval-(time.time()-T1)))
+
+    def poll(self):
+        from Biomet_Database_Functions import WriteDatabase
+        T1 = time.time()
+        Traces = WriteDatabase.MakeTraces(self.db_ini,incremental=True)
+        if self.Name in Traces.Updated:
+            n = self.update(Traces.Updated[self.Name])
+            print(f'Footprints for {n} new half-hours at {self.Name} ({time.time()-T1:.1f} s after polling)')
+        # Metrics are written after every poll, since a watch doesn't finish
+        Instrumentation.write(ReadDatabase.modulePath(self.ini['Instrumentation']['path'],ReadDatabase.MicrometPy),job='watch',site=self.Name)
+
+    def update(self,Index):
+        # Footprints for the half-hours in Index that haven't been processed yet and have all their inputs
+        # Returns the number of half-hours processed
+        Index = Index.difference(self.Processed)
+        if Index.shape[0] == 0:
+            return(0)
+        Years = sorted(set((Index-pd.Timedelta('30min')).year))
+        df = None
+        for stage in self.Stages:
+            Traces = ReadDatabase.LoadTraces(self.Name,Years,stage,list(self.vars.values()),
+                                             Timestamp=self.ini['Site_Info']['timestamp'],ini=self.db_ini).Data
+            Traces = Traces.loc[Traces.index.isin(Index)]
+            df = Traces if df is None else df.combine_first(Traces)
+        df[self.vars['canopy_height']] = df[self.vars['canopy_height']].fillna(float(self.ini['Site_Info']['canopy_height']))
+        df = df.dropna()
+        if df.shape[0] == 0:
+            return(0)
+
+        Records = []
+        for day,batch in df.groupby((df.index-pd.Timedelta('30min')).normalize()):
+            self.fclim_2d = np.zeros(self.x_2d.shape)
+            self.run(batch)
+            Sum,n = self.Daily.get(day,(0,0))
+            self.Daily[day] = (Sum+self.fclim_2d,n+batch.shape[0])
+            Records.append(self.data.set_index(df.index.name))
+        self.Processed = self.Processed.union(df.index)
+        latest = max(self.Daily)
+        for day in [day for day in self.Daily if day <= latest-pd.Timedelta(days=self.window)]:
+            del self.Daily[day]
+
+        Records = pd.concat(Records)[self.Fc_Names+[f'Contribution within {self.domain} m']]
+        Records = Records.loc[~Records.index.isin(self.Recorded)]
+        Records.to_csv(self.Fc_File,mode='a',header=os.path.isfile(self.Fc_File)==False)
+        self.Recorded = self.Recorded.union(Records.index)
+
+        if self.lookup == False:
+            self.fclim_2d = sum(Sum for Sum,n in self.Daily.values())
+            self.summarizeClimatology(sum(n for Sum,n in self.Daily.values()))
+        return(df.shape[0])
+
+
+def classContributions(wind_dir,Lx,Ly,theta,rho,basemap,n_classes):
+    # Contribution of each basemap class (and the total) to the footprint for every (Lx, Ly) at one wind direction
+    # Defined at the module level so it can be mapped over a process pool
+    rotated_theta = theta - wind_dir * np.pi / 180.
+    along = rho * np.cos(rotated_theta)
+    cross = rho * np.sin(rotated_theta)
+    # Cells outside the basemap (NaN) are counted in the total only
+    classes = np.nan_to_num(basemap,nan=0).astype('int64').ravel()
+    classes[(classes < 0) | (classes > n_classes)] = 0
+    Table = np.empty((Lx.shape[0],Ly.shape[0],n_classes+1))
+    for i,lx in enumerate(Lx):
+        for j,ly in enumerate(Ly):
+            f_2d = FFP_Scaled(along,cross,lx,ly).ravel()
+            Table[i,j,:-1] = np.bincount(classes,weights=f_2d,minlength=n_classes+1)[1:n_classes+1]
+            Table[i,j,-1] = f_2d.sum()
+    return(Table)
@@ -92,3 +92,46 @@ def FFP(index,ustar,sigmav,h,ol,wind_dir,z0,zm,theta,rho,x_2d,basemap=None):
             class_sums = np.append(class_sums,np.nansum(temp*f_2d))
         return(index,f_2d,class_sums)
 
+
+
+# The footprint only depends on the wind direction and two length scales:
+#   x* = x/Lx, f_ci = f*(x*)/Lx with Lx = zm (ln(zm/z0) - psi_f) / (1 - zm/h)
+#   sigma_y = sigma_y*(x*) Ly with Ly = zm sigmav / (ustar scale_const)
+# Which lets class contributions be tabulated over (wind_dir, Lx, Ly) for a given basemap
+
+def footprintScales(ustar,sigmav,h,ol,z0,zm):
+    # Along-wind (Lx) and crosswind (Ly) length scales (m) for arrays of inputs, following FFP
+    ustar,sigmav,h,ol,z0,zm = [np.asarray(v,dtype='float64') for v in [ustar,sigmav,h,ol,z0,zm]]
+    oln = 5000 #limit to L for neutral scaling
+
+    with np.errstate(all='ignore'):
+        unstable = (ol <= 0) | (ol >= oln)
+        xx = (1 - 19.0 * zm/ol)**0.25
+        psi_f = np.where(unstable,(np.log((1 + xx**2) / 2.) + 2. * np.log((1 + xx) / 2.) - 2. * np.arctan(xx) + np.pi/2),
+                         -5.3 * zm / ol)
+        Lx = np.where((np.log(zm / z0) - psi_f) > 0,zm * (np.log(zm / z0) - psi_f) / (1. - (zm / h)),np.nan)
+
+        ol = np.where(np.abs(ol) > oln,-1E6,ol)
+        scale_const = np.where(ol <= 0,1E-5 * np.abs(zm / ol)**(-1) + 0.80,1E-5 * np.abs(zm / ol)**(-1) + 0.55)
+        scale_const = np.minimum(scale_const,1.0)
+        Ly = zm * sigmav / (ustar * scale_const)
+    return(Lx,Ly)
+
+def FFP_Scaled(along,cross,Lx,Ly):
+    # Normalized footprint from the along-wind and crosswind distance of each grid cell (m) and the scales from footprintScales
+    # Equivalent to f_2d from FFP with along = rho*cos(rotated_theta) and cross = rho*sin(rotated_theta)
+    a = 1.4524
+    b = -1.9914
+    c = 1.4622
+    d = 0.1359
+    ac = 2.17 
+    bc = 1.66
+    cc = 20.0
+
+    f_2d = np.zeros(along.shape)
+    px = np.where(along / Lx > d)
+    xstar = along[px] / Lx
+    fstar = a * (xstar - d)**b * np.exp(-c / (xstar - d))
+    sigy = ac * np.sqrt(bc * xstar**2 / (1 + cc * xstar)) * Ly
+    f_2d[px] = fstar / Lx / (np.sqrt(2 * np.pi) * sigy) * np.exp(-cross[px]**2 / (2. * sigy**2))
+    return(f_2d/f_2d.sum())
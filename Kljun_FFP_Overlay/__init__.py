@@ -0,0 +1 @@
+# Flux footprint climatologies from the Kljun et al. 2015 model
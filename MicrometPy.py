@@ -0,0 +1,184 @@
+# Command line interface for MicrometPy
+# Each subcommand only imports the modules it needs, so --help and small exports don't pay for the geospatial stack
+# Examples:
+#   python MicrometPy.py read --sites BB --years 2022 2023
+#   python MicrometPy.py write --ini WriteTraces.ini
+#   python MicrometPy.py watch --site BB (ingest new logger files and update the footprints as they arrive)
+#   python MicrometPy.py coverage --site BB --years 2023 --stage Clean/SecondStage/
+#   python MicrometPy.py --metrics runs.jsonl write (record where the time, memory and I/O went in each stage)
+#   python MicrometPy.py benchmark --sites 2 --traces 50 (time the database and NARR jobs on synthetic data, offline)
+#   python MicrometPy.py startup (check the launch time of each subcommand against [Startup_Budget] in MicrometPy.ini)
+
+import os
+import sys
+import time
+import argparse
+import importlib
+import subprocess
+import configparser
+import datetime
+
+MicrometPy = os.path.dirname(os.path.abspath(__file__))
+
+Modules = {
+    'read':'Biomet_Database_Functions.ReadDatabase',
+    'write':'Biomet_Database_Functions.WriteDatabase',
+    'coverage':'Biomet_Database_Functions.ReadDatabase',
+    'narr':'Extract_NARR_Data.Interpolation',
+    'footprint':'Kljun_FFP_Overlay.FFP_Asssment',
+    'watch':'Kljun_FFP_Overlay.FFP_Asssment',
+    'benchmark':'Benchmark',
+}
+
+def load(command):
+    # Import the module behind a subcommand
+    if MicrometPy not in sys.path:
+        sys.path.insert(0,MicrometPy)
+    return(importlib.import_module(Modules[command]))
+
+def read(args):
+    load('read').MakeCSV(args.sites,args.years,args.ini)
+
+def write(args):
+    load('write').MakeTraces(args.ini,incremental=not args.full)
+
+def coverage(args):
+    Summary = load('coverage').Summary(args.site,args.years,args.stage,Traces=args.traces,Freq=args.freq,ini=args.ini)
+    if args.rebuild:
+        Summary.rebuild()
+        Summary = load('coverage').Summary(args.site,args.years,args.stage,Traces=args.traces,Freq=args.freq,ini=args.ini)
+    print(Summary.coverage().round(3).to_string())
+
+def narr(args):
+    load('narr').PointSampleNARR(args.site,args.years,args.verbose,ini=args.ini)
+
+def footprint(args):
+    load('footprint').RunClimatology(args.site,Date_Range_Set=args.dates,Years=args.years,ini=args.ini)
+
+def watch(args):
+    Watch = load('watch').WatchClimatology(args.site,ini=args.ini)
+    if args.metrics is not None:
+        Watch.ini['Instrumentation']['path'] = os.path.abspath(args.metrics)
+    Watch.watch(polls=args.polls)
+
+def benchmark(args):
+    Benchmark = load('benchmark').Benchmark(Sites=args.sites,Years=args.years,Traces=args.traces,Days=args.days,Columns=args.columns,
+                                            Formats=args.formats,NARR_Days=args.narr_days,NARR_Grid=args.narr_grid,
+                                            Processes=args.processes,Threads=args.threads,jobs=args.jobs,root=args.dir,keep=args.keep)
+    Benchmark.write(args.output)
+
+def startup(args):
+    # Launch time of each subcommand, from interpreter start to the point where work begins (best of args.repeat)
+    ini = configparser.ConfigParser()
+    ini.read(os.path.join(MicrometPy,'MicrometPy.ini'))
+    Budget = ini['Startup_Budget']
+    failed = []
+    for command in ['help']+list(Modules):
+        if command == 'help':
+            cmd = [sys.executable,os.path.abspath(__file__),'--help']
+        else:
+            cmd = [sys.executable,'-c',f'import MicrometPy; MicrometPy.load("{command}")']
+        times = []
+        for i in range(args.repeat):
+            T1 = time.perf_counter()
+            run = subprocess.run(cmd,cwd=MicrometPy,capture_output=True)
+            times.append(time.perf_counter()-T1)
+        if run.returncode != 0:
+            print(f"{command:<10} failed to start: {run.stderr.decode().strip().splitlines()[-1]}")
+            failed.append(command)
+        elif min(times) > Budget.getfloat(command):
+            print(f"{command:<10} {min(times):6.3f} s  over the budget of {Budget.getfloat(command):.2f} s")
+            failed.append(command)
+        else:
+            print(f"{command:<10} {min(times):6.3f} s  (budget {Budget.getfloat(command):.2f} s)")
+    if len(failed) > 0:
+        sys.exit(f"Startup budget not met for: {', '.join(failed)}")
+
+def main(argv=None):
+    CLI = argparse.ArgumentParser(prog='MicrometPy',description='UBC Micromet data tools')
+    Commands = CLI.add_subparsers(dest='command',required=True)
+
+    Read = Commands.add_parser('read',help='Export traces from the Biomet database')
+    Read.add_argument('--sites',nargs='+',type=str,default=['BB','BB2','BBS','RBM','DSM','HOGG','YOUNG'])
+    Read.add_argument('--years',nargs='+',type=int,default=list(range(2014,datetime.datetime.now().year+1)))
+    Read.add_argument('--ini',nargs='+',type=str,default=['ReadTraces.ini'])
+    Read.set_defaults(run=read)
+
+    Write = Commands.add_parser('write',help='Write logger files from the datadump to the Biomet database')
+    Write.add_argument('--ini',nargs='+',type=str,default=['WriteTraces.ini'])
+    Write.add_argument('--full',action='store_true',help='Ignore the manifest and re-ingest every file')
+    Write.set_defaults(run=write)
+
+    Coverage = Commands.add_parser('coverage',help='Data coverage from the trace summary sidecars')
+    Coverage.add_argument('--site',type=str,required=True)
+    Coverage.add_argument('--years',nargs='+',type=int,required=True)
+    Coverage.add_argument('--stage',type=str,required=True)
+    Coverage.add_argument('--traces',nargs='+',type=str,default=None)
+    Coverage.add_argument('--freq',type=str,default='M',choices=['D','M'])
+    Coverage.add_argument('--ini',nargs='+',type=str,default=[])
+    Coverage.add_argument('--rebuild',action='store_true',help='Recreate the sidecars from the traces first')
+    Coverage.set_defaults(run=coverage)
+
+    NARR = Commands.add_parser('narr',help='Interpolate NARR data to a site')
+    NARR.add_argument('--site',type=str,default='BB')
+    NARR.add_argument('--years',nargs='+',type=int,default=[])
+    NARR.add_argument('--verbose',type=int,default=0)
+    NARR.add_argument('--ini',nargs='+',type=str,default=[],help='Additional configs, e.g. to override [Downloads] or [Outputs]')
+    NARR.set_defaults(run=narr)
+
+    Footprint = Commands.add_parser('footprint',help='Run the Kljun et al. 2015 footprint climatology for a site')
+    Footprint.add_argument('--site',type=str,default='BB')
+    Footprint.add_argument('--years',nargs='+',type=int,default=None)
+    Footprint.add_argument('--dates',nargs=2,action='append',default=None,metavar=('START','END'),
+                           help='Date range to include (can be repeated)')
+    Footprint.add_argument('--ini',nargs='+',type=str,default=[],help='Additional configs, e.g. to read from the database')
+    Footprint.set_defaults(run=footprint)
+
+    Watch = Commands.add_parser('watch',help='Poll the datadump and update the database and footprints as new files arrive')
+    Watch.add_argument('--site',type=str,default='BB')
+    Watch.add_argument('--ini',nargs='+',type=str,default=[],help='Additional configs, e.g. to override [Watch]')
+    Watch.add_argument('--polls',type=int,default=None,help='Stop after this many polls (default: run until interrupted)')
+    Watch.set_defaults(run=watch)
+
+    Bench = Commands.add_parser('benchmark',help='Time MakeTraces, MakeCSV and PointSampleNARR on synthetic data and report the throughput as JSON')
+    Bench.add_argument('--sites',type=int,default=1,help='Number of synthetic sites')
+    Bench.add_argument('--years',nargs='+',type=int,default=[2023],help='Years in the synthetic database')
+    Bench.add_argument('--traces',type=int,default=20,help='Traces per site and year in the synthetic database')
+    Bench.add_argument('--days',type=int,default=30,help='Days of logger files (one TOA5 and one CR10X file per day) per site')
+    Bench.add_argument('--columns',type=int,default=16,help='Data columns in each logger file')
+    Bench.add_argument('--formats',nargs='+',type=str,default=['csv'],choices=['csv','parquet','feather','npz'],help='Output formats for MakeCSV')
+    Bench.add_argument('--narr-days',type=int,default=365,help='Days in the synthetic NARR file (3 hourly)')
+    Bench.add_argument('--narr-grid',type=int,default=24,help='Size of the synthetic NARR grid (cells per side)')
+    Bench.add_argument('--processes',type=int,default=None,help='Parse processes for MakeTraces (default: WriteTraces.ini)')
+    Bench.add_argument('--threads',type=int,default=None,help='Write threads for MakeTraces (default: WriteTraces.ini)')
+    Bench.add_argument('--jobs',nargs='+',type=str,default=['write','read','narr'],choices=['write','read','narr'])
+    Bench.add_argument('--dir',type=str,default=None,help='Empty folder for the fixtures (default: a temporary folder)')
+    Bench.add_argument('--keep',action='store_true',help='Keep the fixtures and outputs')
+    Bench.add_argument('--output',type=str,default=None,help='Write the results here (.json, or .jsonl to append) instead of stdout')
+    Bench.set_defaults(run=benchmark)
+
+    Startup = Commands.add_parser('startup',help='Check the launch time of each subcommand against its budget')
+    Startup.add_argument('--repeat',type=int,default=5)
+    Startup.set_defaults(run=startup)
+
+    CLI.add_argument('--metrics',type=str,default=None,
+                     help='Write stage level metrics to this file (.jsonl or .prom), overrides [Instrumentation] in MicrometPy.ini')
+
+    args = CLI.parse_args(argv)
+    args.run(args)
+    if args.command != 'startup':
+        metrics(args)
+
+def metrics(args):
+    # Stage level timings, memory, I/O and record counts for the run
+    ini = configparser.ConfigParser()
+    ini.read(os.path.join(MicrometPy,'MicrometPy.ini'))
+    path = args.metrics if args.metrics is not None else ini['Instrumentation']['path']
+    if path not in ['','None']:
+        if args.metrics is None and os.path.isabs(path) == False:
+            path = os.path.join(MicrometPy,path)
+        from Biomet_Database_Functions import Instrumentation
+        Instrumentation.write(path,job=args.command)
+
+if __name__ == '__main__':
+    main()